@@ -20,8 +20,10 @@ import pandas as pd
 import numpy as np
 import datetime
 import os
+from functools import lru_cache
 
-from .OrderBook.Orders import Order, Quote
+from .OrderBook.Orders import (Quote, QS_ACCEPTED, QS_EXECUTED_PART, QS_EXECUTED_FULL, QS_CANCELLED,
+                               QS_AMENDED, QS_EXPIRED, QS_REJECTED, QS_SUSPENDED)
 from .utils.Logger import getLogger
 
 def opposite(S):
@@ -30,6 +32,256 @@ def opposite(S):
     elif S == 'Bid':
         return('Ask')
 
+# MessageType and Side values. Within the event classification loops the MessageType 
+# and Side of a message are represented by their integer codes, i.e. their positions 
+# in message_types and sides. Other or missing values have code -1.
+message_types = ['New_Order', 'New_Quote', 'Cancel_Request', 'Cancel_Replace_Request', 'Other_Inbound',
+                 'Execution_Report', 'Cancel_Reject', 'Other_Reject', 'Other_Outbound']
+(MT_NEW_ORDER, MT_NEW_QUOTE, MT_CANCEL_REQUEST, MT_CANCEL_REPLACE_REQUEST, MT_OTHER_INBOUND,
+ MT_EXECUTION_REPORT, MT_CANCEL_REJECT, MT_OTHER_REJECT, MT_OTHER_OUTBOUND) = range(len(message_types))
+sides = ['Bid', 'Ask']
+
+# Fields that jointly determine the UnifiedMessageType of a message
+umt_fields = ['MessageType', 'OrderType', 'TIF', 'ExecType', 'OrderStatus', 'TradeInitiator', 'CancelRejectReason']
+
+# UnifiedMessageType categories. Within the event classification loops the 
+# UnifiedMessageType of a message is represented by its integer code, 
+# i.e. its position in unified_message_types. Messages with a missing 
+# UnifiedMessageType have code UMT_MISSING.
+unified_message_types = [
+    # Inbound
+    'Gateway New Order (Market)',
+    'Gateway New Order (Limit)',
+    'Gateway New Order (IOC)',
+    'Gateway New Order (Stop)',
+    'Gateway New Order (Stop Limit)',
+    'Gateway New Order (Pegged)',
+    'Gateway New Order (Passive Only)',
+    'Gateway New Order (Other)',
+    'Gateway New Quote',
+    'Gateway Cancel',
+    'Gateway Cancel/Replace',
+    'Gateway Other Inbound',
+    # Outbound
+    'ME: New Order Accept',
+    'ME: Order Reject',
+    'ME: Order Expire',
+    'ME: Order Suspend',
+    'ME: Order Restated',
+    'ME: Partial Fill (P)',
+    'ME: Partial Fill (A)',
+    'ME: Partial Fill (Other)',
+    'ME: Full Fill (P)',
+    'ME: Full Fill (A)',
+    'ME: Full Fill (Other)',
+    'ME: Cancel Accept',
+    'ME: Cancel/Replace Accept',
+    'ME: Cancel Reject (TLTC)',
+    'ME: Cancel Reject (Other)',
+    'ME: Other Reject',
+    'ME: Other Outbound',
+    'ME: Execution Report (Other)',
+]
+(UMT_GW_NEW_ORDER_MARKET, UMT_GW_NEW_ORDER_LIMIT, UMT_GW_NEW_ORDER_IOC,
+ UMT_GW_NEW_ORDER_STOP, UMT_GW_NEW_ORDER_STOP_LIMIT, UMT_GW_NEW_ORDER_PEGGED,
+ UMT_GW_NEW_ORDER_PASSIVE_ONLY, UMT_GW_NEW_ORDER_OTHER, UMT_GW_NEW_QUOTE,
+ UMT_GW_CANCEL, UMT_GW_CANCEL_REPLACE, UMT_GW_OTHER_INBOUND,
+ UMT_ME_NEW_ORDER_ACCEPT, UMT_ME_ORDER_REJECT, UMT_ME_ORDER_EXPIRE,
+ UMT_ME_ORDER_SUSPEND, UMT_ME_ORDER_RESTATED, UMT_ME_PARTIAL_FILL_PASSIVE,
+ UMT_ME_PARTIAL_FILL_AGGR, UMT_ME_PARTIAL_FILL_OTHER, UMT_ME_FULL_FILL_PASSIVE,
+ UMT_ME_FULL_FILL_AGGR, UMT_ME_FULL_FILL_OTHER, UMT_ME_CANCEL_ACCEPT,
+ UMT_ME_CANCEL_REPLACE_ACCEPT, UMT_ME_CANCEL_REJECT_TLTC, UMT_ME_CANCEL_REJECT_OTHER,
+ UMT_ME_OTHER_REJECT, UMT_ME_OTHER_OUTBOUND, UMT_ME_EXECUTION_REPORT_OTHER) = range(len(unified_message_types))
+UMT_MISSING = len(unified_message_types)
+umt_codes = {umt: code for code, umt in enumerate(unified_message_types)}
+# Lookup tables for the direction of each code, including UMT_MISSING (neither inbound nor outbound)
+umt_inbound = np.array([umt.startswith('Gateway') for umt in unified_message_types] + [False])
+umt_outbound = np.array([umt.startswith('ME:') for umt in unified_message_types] + [False])
+
+# Sets of UnifiedMessageType codes represented as bit masks.
+# Membership of a code is tested with (1 << code) & mask.
+def umt_mask(*codes):
+    return sum(1 << code for code in codes)
+# New orders with price information
+PRICED_NEW_ORDER_MASK = umt_mask(UMT_GW_NEW_ORDER_LIMIT, UMT_GW_NEW_ORDER_IOC, UMT_GW_NEW_ORDER_STOP_LIMIT, 
+                                 UMT_GW_NEW_ORDER_PASSIVE_ONLY, UMT_GW_NEW_ORDER_OTHER)
+# Rejects of new orders/quotes
+ORDER_REJECT_MASK = umt_mask(UMT_ME_ORDER_REJECT, UMT_ME_OTHER_REJECT)
+# Rejects of cancels for reasons other than TLTC
+CANCEL_FAIL_MASK = umt_mask(UMT_ME_CANCEL_REJECT_OTHER, UMT_ME_OTHER_REJECT)
+# All rejects of cancels
+CANCEL_REJECT_MASK = umt_mask(UMT_ME_CANCEL_REJECT_TLTC, UMT_ME_CANCEL_REJECT_OTHER, UMT_ME_OTHER_REJECT)
+# Accepts of new quotes
+QUOTE_ACCEPT_MASK = umt_mask(UMT_ME_CANCEL_REPLACE_ACCEPT, UMT_ME_NEW_ORDER_ACCEPT)
+# Passive fills
+PASSIVE_FILL_MASK = umt_mask(UMT_ME_PARTIAL_FILL_PASSIVE, UMT_ME_FULL_FILL_PASSIVE)
+# Outbounds other than Execution_Report
+NON_EXECUTION_OUTBOUND_MASK = umt_mask(UMT_ME_CANCEL_REJECT_TLTC, UMT_ME_CANCEL_REJECT_OTHER, UMT_ME_OTHER_REJECT, UMT_ME_OTHER_OUTBOUND)
+
+# Event categories. Within the event classification loops the Event of a message 
+# is represented by its integer code, i.e. its position in event_names.
+# Messages without an event have code EV_NONE (empty string).
+event_names = [
+    '',
+    # Order events
+    'New order accepted',
+    'New order aggressively executed in full',
+    'New order aggressively executed in part',
+    'New order expired',
+    'New order failed',
+    'New order suspended',
+    'New order no response',
+    'Cancel request accepted',
+    'Cancel request rejected',
+    'Cancel request failed',
+    'Cancel no response',
+    'Cancel/replace request accepted',
+    'Cancel/replace request aggr executed in full',
+    'Cancel/replace request aggr executed in part',
+    'Cancel/replace request rejected',
+    'Cancel/replace request failed',
+    'Cancel/replace no response',
+    'Order passively executed in part',
+    'Order passively executed in full',
+    'Order executed in part (other)',
+    'Order executed in full (other)',
+    'Other Gateway activity',
+    # Quote events
+    'New quote accepted',
+    'New quote updated',
+    'New quote aggressively executed in full',
+    'New quote aggressively executed in part',
+    'New quote expired',
+    'New quote failed',
+    'New quote suspended',
+    'New quote no response',
+    'Quote cancel accepted',
+    'Quote cancel rejected',
+    'Quote cancel failed',
+    'Quote cancel no response',
+    'Quote passively executed in part',
+    'Quote passively executed in full',
+    'Quote executed in part (other)',
+    'Quote executed in full (other)',
+    # Order and quote events
+    'Other ME activity',
+]
+(EV_NONE, EV_NEW_ORDER_ACCEPTED, EV_NEW_ORDER_AGGRESSIVELY_EXECUTED_IN_FULL,
+ EV_NEW_ORDER_AGGRESSIVELY_EXECUTED_IN_PART, EV_NEW_ORDER_EXPIRED, EV_NEW_ORDER_FAILED,
+ EV_NEW_ORDER_SUSPENDED, EV_NEW_ORDER_NO_RESPONSE, EV_CANCEL_REQUEST_ACCEPTED,
+ EV_CANCEL_REQUEST_REJECTED, EV_CANCEL_REQUEST_FAILED, EV_CANCEL_NO_RESPONSE,
+ EV_CANCEL_REPLACE_REQUEST_ACCEPTED, EV_CANCEL_REPLACE_REQUEST_AGGR_EXECUTED_IN_FULL, EV_CANCEL_REPLACE_REQUEST_AGGR_EXECUTED_IN_PART,
+ EV_CANCEL_REPLACE_REQUEST_REJECTED, EV_CANCEL_REPLACE_REQUEST_FAILED, EV_CANCEL_REPLACE_NO_RESPONSE,
+ EV_ORDER_PASSIVELY_EXECUTED_IN_PART, EV_ORDER_PASSIVELY_EXECUTED_IN_FULL, EV_ORDER_EXECUTED_IN_PART_OTHER,
+ EV_ORDER_EXECUTED_IN_FULL_OTHER, EV_OTHER_GATEWAY_ACTIVITY, EV_NEW_QUOTE_ACCEPTED,
+ EV_NEW_QUOTE_UPDATED, EV_NEW_QUOTE_AGGRESSIVELY_EXECUTED_IN_FULL, EV_NEW_QUOTE_AGGRESSIVELY_EXECUTED_IN_PART,
+ EV_NEW_QUOTE_EXPIRED, EV_NEW_QUOTE_FAILED, EV_NEW_QUOTE_SUSPENDED,
+ EV_NEW_QUOTE_NO_RESPONSE, EV_QUOTE_CANCEL_ACCEPTED, EV_QUOTE_CANCEL_REJECTED,
+ EV_QUOTE_CANCEL_FAILED, EV_QUOTE_CANCEL_NO_RESPONSE, EV_QUOTE_PASSIVELY_EXECUTED_IN_PART,
+ EV_QUOTE_PASSIVELY_EXECUTED_IN_FULL, EV_QUOTE_EXECUTED_IN_PART_OTHER, EV_QUOTE_EXECUTED_IN_FULL_OTHER,
+ EV_OTHER_ME_ACTIVITY) = range(len(event_names))
+
+# Lookup table for the event of a Gateway Cancel given the UnifiedMessageType code of its ME reply
+# (EV_NONE if the message is not a reply to the cancel)
+cancel_reply_events = [EV_NONE] * (UMT_MISSING + 1)
+cancel_reply_events[UMT_ME_CANCEL_ACCEPT] = EV_CANCEL_REQUEST_ACCEPTED
+cancel_reply_events[UMT_ME_CANCEL_REJECT_TLTC] = EV_CANCEL_REQUEST_REJECTED
+cancel_reply_events[UMT_ME_CANCEL_REJECT_OTHER] = EV_CANCEL_REQUEST_FAILED
+cancel_reply_events[UMT_ME_OTHER_REJECT] = EV_CANCEL_REQUEST_FAILED
+
+def unified_message_type(msg_type, order_type, tif, exec_type, order_status, trade_initiator, cancel_reject_reason):
+    '''
+    Returns the UnifiedMessageType of a message given its type fields (umt_fields).
+    Returns np.nan if the MessageType is not recognized.
+    See the ADDING UNIFIED MESSAGE TYPE section of classify_messages() for the categories.
+    '''
+    ### Unified Message Type for Gateway Messages (Inbound)
+    ## New_Order messages
+    # All new order messages are first assigned the default 
+    # UnifiedMessageType 'Gateway New Order (Other)', and then categorized according 
+    # to the order type.
+    # Please note that 'Gateway New Order (IOC)' includes both IOCs and FOKs.
+    # We will use the TIF field to separate IOC and FOK orders later in the code.
+    if msg_type == 'New_Order':
+        if order_type == 'Market':
+            return 'Gateway New Order (Market)'
+        elif order_type == 'Limit' and tif == 'GoodTill':
+            return 'Gateway New Order (Limit)'
+        elif order_type == 'Limit' and tif in ('IOC', 'FOK'):
+            return 'Gateway New Order (IOC)'
+        elif order_type == 'Stop':
+            return 'Gateway New Order (Stop)'
+        elif order_type == 'Stop_Limit':
+            return 'Gateway New Order (Stop Limit)'
+        elif order_type == 'Pegged':
+            return 'Gateway New Order (Pegged)'
+        elif order_type == 'Passive_Only':
+            return 'Gateway New Order (Passive Only)'
+        return 'Gateway New Order (Other)'
+    ## New_Quote messages
+    elif msg_type == 'New_Quote':
+        return 'Gateway New Quote'
+    ## Cancel messages 
+    elif msg_type == 'Cancel_Request':
+        return 'Gateway Cancel'
+    elif msg_type == 'Cancel_Replace_Request':
+        return 'Gateway Cancel/Replace'
+    ## Other Inbound
+    elif msg_type == 'Other_Inbound':
+        return 'Gateway Other Inbound'
+
+    ### Unified Message Type for Matching Engine messages (outbound)
+    ## Execution_Report
+    # Execution_Report that cannot be categorized according to other variables are Other
+    elif msg_type == 'Execution_Report':
+        # Fill Execution_Report
+        if exec_type == 'Order_Executed' and order_status in ('Partial_Fill', 'Full_Fill'):
+            fill = 'Partial Fill' if order_status == 'Partial_Fill' else 'Full Fill'
+            if trade_initiator == 'Passive':
+                return 'ME: %s (P)' % fill
+            elif trade_initiator == 'Aggressive':
+                return 'ME: %s (A)' % fill
+            return 'ME: %s (Other)' % fill
+        # Non-fill Execution_Report
+        elif exec_type == 'Order_Expired':
+            return 'ME: Order Expire'
+        elif exec_type == 'Order_Cancelled':
+            return 'ME: Cancel Accept'
+        elif exec_type == 'Order_Replaced':
+            return 'ME: Cancel/Replace Accept'
+        elif exec_type == 'Order_Suspended':
+            return 'ME: Order Suspend'
+        elif exec_type == 'Order_Restated':
+            return 'ME: Order Restated'
+        elif exec_type == 'Order_Accepted':
+            return 'ME: New Order Accept'
+        elif exec_type == 'Order_Rejected':
+            return 'ME: Order Reject'
+        return 'ME: Execution Report (Other)'
+    ## Cancel_Reject
+    elif msg_type == 'Cancel_Reject':
+        if cancel_reject_reason == 'TLTC':
+            return 'ME: Cancel Reject (TLTC)'
+        return 'ME: Cancel Reject (Other)'
+    ## Other reject 
+    # In the LSE dataset, this includes protocol reject and business reject cancel for cancel requests or new orders/quotes
+    elif msg_type == 'Other_Reject':
+        return 'ME: Other Reject'
+    ## Other Outbounds
+    elif msg_type == 'Other_Outbound':
+        return 'ME: Other Outbound'
+    return np.nan
+
+@lru_cache(maxsize=None)
+def unified_message_type_code(msg_type, order_type, tif, exec_type, order_status, trade_initiator, cancel_reject_reason):
+    '''
+    Returns the UnifiedMessageType code (UMT_MISSING if missing) of a message given its type fields.
+    The results are cached, so each combination of the type fields is classified once per process
+    and reused across symbol-dates.
+    '''
+    return umt_codes.get(unified_message_type(msg_type, order_type, tif, exec_type, order_status, 
+                                              trade_initiator, cancel_reject_reason), UMT_MISSING)
+
 def classify_messages(runtime, date, sym, args, paths):
     '''
     Function to classify messages into meaningful economic events.
@@ -83,16 +335,16 @@ def classify_messages(runtime, date, sym, args, paths):
                 message in the event.
         
         The additional fields and their data types are as follows
-            {'UnifiedMessageType': 'O',
-            'Categorized': 'bool', 'EventNum': 'float64', 'Event': 'O', 
-            'PrevPriceLvl': 'int64', 'PrevQty': 'float64', 'PriceLvl': 'int64', 
-            'MinExecPriceLvl':'int64', 'MaxExecPriceLvl':'int64', 
-            'BidCategorized': 'bool', 'BidEventNum': 'float64', 'BidEvent': 'O', 
-            'PrevBidPriceLvl': 'int64', 'PrevBidQty': 'float64', 'BidPriceLvl': 'int64', 
-            'BidMinExecPriceLvl':'int64', 'BidMaxExecPriceLvl':'int64', 
-            'AskCategorized': 'bool', 'AskEventNum': 'float64', 'AskEvent': 'O',
-            'PrevAskPriceLvl': 'int64', 'PrevAskQty': 'float64', 'AskPriceLvl': 'int64', 
-            'AskMinExecPriceLvl':'int64', 'AskMaxExecPriceLvl':'int64'}
+            {'UnifiedMessageType': 'category',
+            'Categorized': 'bool', 'EventNum': 'Int32', 'Event': 'category', 
+            'PrevPriceLvl': 'float64', 'PrevQty': 'float64', 'PriceLvl': 'float64', 
+            'MinExecPriceLvl': 'float64', 'MaxExecPriceLvl': 'float64', 
+            'BidCategorized': 'bool', 'BidEventNum': 'Int32', 'BidEvent': 'category', 
+            'PrevBidPriceLvl': 'float64', 'PrevBidQty': 'float64', 'BidPriceLvl': 'float64', 
+            'BidMinExecPriceLvl': 'float64', 'BidMaxExecPriceLvl': 'float64', 
+            'AskCategorized': 'bool', 'AskEventNum': 'Int32', 'AskEvent': 'category',
+            'PrevAskPriceLvl': 'float64', 'PrevAskQty': 'float64', 'AskPriceLvl': 'float64', 
+            'AskMinExecPriceLvl': 'float64', 'AskMaxExecPriceLvl': 'float64'}
             
     Steps:
         1. Add UnifiedMessageType. Combine multiple fields with message type information 
@@ -137,11 +389,15 @@ def classify_messages(runtime, date, sym, args, paths):
 
     # Load data
     # msgs refers to the full dataframe of messages of the symbol-date
+    # The C parser is used explicitly: it supports skipinitialspace, which the 
+    # pyarrow engine does not, and loading is a small share of the run time 
+    # compared with the event classification below.
     msgs = pd.read_csv(infile_msgs, 
                      dtype = dtypes_raw_msgs, 
                      parse_dates = ['MessageTimestamp'], 
                      skipinitialspace = True, 
-                     compression = 'gzip')
+                     compression = 'gzip',
+                     engine = 'c')
     
     # Data check: assertion that all required fields are included
     col_required = [
@@ -154,18 +410,26 @@ def classify_messages(runtime, date, sym, args, paths):
     assert len(missing_columns) == 0, 'Missing Data in Symbol-Date (%s, %s) Raw Message Data: missing fields %s' % (date, sym, missing_columns)
     
     ## Replace the NAs in AuctionTrade and OpenAuctionTrade with False
+    # The columns are stored as plain bool (read_csv gives object columns when there are NAs)
     bool_cols_trades = ['AuctionTrade','OpenAuctionTrade']
     for col in bool_cols_trades:
-        msgs.loc[msgs[col].isna(), col] = False
+        msgs[col] = msgs[col].fillna(False).astype(bool)
 
     ## Convert prices into integers by multiplying price_factor.
     # price_factor = int(10 ** (max_dec_scale+1)). 
     # max_dec_scale is the max decimal scale of the price-related variables. 
     # The prices are turned to integers to avoid floating point error 
     # that can mess up race detection.
+    # The conversion is done in one pass over a (price column x message) block.
+    # The rounded prices are kept as float64 with NaN for missing values: they
+    # are exact integers (well below 2**53) and the later steps read them back
+    # as float64, so a nullable Int64 column would only slow down access.
     prices = ['LimitPrice', 'StopPrice', 'ExecutedPrice', 'BidPrice', 'AskPrice']
-    for col in prices:
-        msgs[col] = (price_factor * msgs[col]).round(-1).astype('Int64')
+    block = np.ascontiguousarray(msgs[prices].to_numpy(dtype=np.float64).T)
+    np.multiply(block, price_factor, out=block)
+    np.round(block, -1, out=block)
+    for n, col in enumerate(prices):
+        msgs[col] = block[n]
     
     ###################################
     ### ADDING UNIFIED MESSAGE TYPE ###
@@ -255,66 +519,35 @@ def classify_messages(runtime, date, sym, args, paths):
     #                  ME: Other Reject, ME: Other Outbound
 
 
-    ### Create Unified Message Type variable for Gateway Messages (Inbound)
-    ## New_Order messages
-    # All new order messages are first assigned the default 
-    # UnifiedMessageType 'Gateway New Order (Other)', and then categorized according 
-    # to the order type.
-    # Please note that 'Gateway New Order (IOC)' includes both IOCs and FOKs.
-    # We will use the TIF field to separate IOC and FOK orders later in the code.
-    new_orders = msgs['MessageType'] == 'New_Order'
-    msgs.loc[(new_orders), 'UnifiedMessageType'] = 'Gateway New Order (Other)'
-    msgs.loc[(new_orders) & (msgs['OrderType'] == 'Market'), 'UnifiedMessageType'] = 'Gateway New Order (Market)'
-    msgs.loc[(new_orders) & (msgs['OrderType'] == 'Limit') & (msgs['TIF'] == 'GoodTill'), 'UnifiedMessageType'] = 'Gateway New Order (Limit)'
-    msgs.loc[(new_orders) & (msgs['OrderType'] == 'Limit') & (msgs['TIF'].isin({'IOC','FOK'})), 'UnifiedMessageType'] = 'Gateway New Order (IOC)'
-    msgs.loc[(new_orders) & (msgs['OrderType'] == 'Stop'), 'UnifiedMessageType'] = 'Gateway New Order (Stop)'
-    msgs.loc[(new_orders) & (msgs['OrderType'] == 'Stop_Limit'), 'UnifiedMessageType'] = 'Gateway New Order (Stop Limit)'
-    msgs.loc[(new_orders) & (msgs['OrderType'] == 'Pegged'), 'UnifiedMessageType'] = 'Gateway New Order (Pegged)'
-    msgs.loc[(new_orders) & (msgs['OrderType'] == 'Passive_Only'), 'UnifiedMessageType'] = 'Gateway New Order (Passive Only)'
-    ## New_Quote messages
-    msgs.loc[(msgs['MessageType'] == 'New_Quote'), 'UnifiedMessageType'] = 'Gateway New Quote'
-    ## Cancel messages 
-    msgs.loc[(msgs['MessageType'] == 'Cancel_Request'), 'UnifiedMessageType'] = 'Gateway Cancel'
-    msgs.loc[(msgs['MessageType'] == 'Cancel_Replace_Request'), 'UnifiedMessageType'] = 'Gateway Cancel/Replace'
-    ## Other Inbound
-    msgs.loc[(msgs['MessageType'] == 'Other_Inbound'), 'UnifiedMessageType'] = 'Gateway Other Inbound'
-
-    ### Create Unified Message Type variable for Matching Engine messages (outbound)
-    ## Execution_Report
-    # Set Unified Message Type for all Execution_Report to Other and then update Type according to other variables
-    execution_reports = msgs['MessageType'] == 'Execution_Report'
-    msgs.loc[(execution_reports), 'UnifiedMessageType'] = 'ME: Execution Report (Other)'
-    # Non-fill Execution_Report
-    msgs.loc[(execution_reports) & (msgs['ExecType'] == 'Order_Expired'), 'UnifiedMessageType'] = 'ME: Order Expire'
-    msgs.loc[(execution_reports) & (msgs['ExecType'] == 'Order_Cancelled'), 'UnifiedMessageType'] = 'ME: Cancel Accept'
-    msgs.loc[(execution_reports) & (msgs['ExecType'] == 'Order_Replaced'), 'UnifiedMessageType'] = 'ME: Cancel/Replace Accept'
-    msgs.loc[(execution_reports) & (msgs['ExecType'] == 'Order_Suspended'), 'UnifiedMessageType'] = 'ME: Order Suspend'
-    msgs.loc[(execution_reports) & (msgs['ExecType'] == 'Order_Restated'), 'UnifiedMessageType'] = 'ME: Order Restated'
-    msgs.loc[(execution_reports) & (msgs['ExecType'] == 'Order_Accepted'), 'UnifiedMessageType'] = 'ME: New Order Accept'
-    msgs.loc[(execution_reports) & (msgs['ExecType'] == 'Order_Rejected'), 'UnifiedMessageType'] = 'ME: Order Reject'
-    # Fill Execution_Report
-    order_executed = msgs['ExecType'] == 'Order_Executed'
-    partial_fills = msgs['OrderStatus'] == 'Partial_Fill'
-    full_fills = msgs['OrderStatus'] == 'Full_Fill'
-    msgs.loc[(execution_reports) & (order_executed) & (partial_fills), 'UnifiedMessageType'] = 'ME: Partial Fill (Other)'
-    msgs.loc[(execution_reports) & (order_executed) & (partial_fills) & (msgs['TradeInitiator'] == 'Passive'), 'UnifiedMessageType'] = 'ME: Partial Fill (P)'
-    msgs.loc[(execution_reports) & (order_executed) & (partial_fills) & (msgs['TradeInitiator'] == 'Aggressive'), 'UnifiedMessageType'] = 'ME: Partial Fill (A)'
-    msgs.loc[(execution_reports) & (order_executed) & (full_fills), 'UnifiedMessageType'] = 'ME: Full Fill (Other)'
-    msgs.loc[(execution_reports) & (order_executed) & (full_fills) & (msgs['TradeInitiator'] == 'Passive'), 'UnifiedMessageType'] = 'ME: Full Fill (P)'
-    msgs.loc[(execution_reports) & (order_executed) & (full_fills) & (msgs['TradeInitiator'] == 'Aggressive'), 'UnifiedMessageType'] = 'ME: Full Fill (A)'
-    ## Cancel_Reject
-    cancel_rejects = msgs['MessageType'] == 'Cancel_Reject'
-    msgs.loc[(cancel_rejects), 'UnifiedMessageType'] = 'ME: Cancel Reject (Other)'
-    msgs.loc[(cancel_rejects) & (msgs['CancelRejectReason'] == 'TLTC'), 'UnifiedMessageType'] = 'ME: Cancel Reject (TLTC)'
-    ## Other reject 
-    # In the LSE dataset, this includes protocol reject and business reject cancel for cancel requests or new orders/quotes
-    msgs.loc[(msgs['MessageType'] == 'Other_Reject'), 'UnifiedMessageType'] = 'ME: Other Reject'
-    ## Other Outbounds
-    msgs.loc[(msgs['MessageType'] == 'Other_Outbound'), 'UnifiedMessageType'] = 'ME: Other Outbound'
+    # The rules are implemented in unified_message_type() and are looked up once per
+    # distinct combination of the type fields rather than once per message 
+    # (unified_message_type_code() caches the result of each combination). 
+    # Each type field is factorized and the codes are packed into a single integer key.
+    # Missing values are given code 0.
+    keys = np.zeros(msgs.shape[0], dtype=np.int64)
+    levels = []
+    for col in umt_fields:
+        codes, uniques = pd.factorize(msgs[col])
+        keys = keys * (len(uniques) + 1) + (codes + 1)
+        levels.append(uniques)
+    combos, inverse = np.unique(keys, return_inverse=True)
+    lut = np.empty(len(combos), dtype=np.int8)
+    for n, key in enumerate(combos):
+        values = []
+        for uniques in reversed(levels):
+            key, code = divmod(int(key), len(uniques) + 1)
+            values.append(uniques[code - 1] if code > 0 else np.nan)
+        lut[n] = unified_message_type_code(*reversed(values))
+    umt_codes_msgs = lut[inverse]
+    # UnifiedMessageType is stored as a categorical built directly from the codes (-1 for missing)
+    msgs['UnifiedMessageType'] = pd.Categorical.from_codes(np.where(umt_codes_msgs == UMT_MISSING, -1, umt_codes_msgs), 
+                                                           categories=unified_message_types)
 
     # Add Inbound and Outbound indicators
-    msgs['Inbound'] = msgs['MessageType'].isin({'New_Order','New_Quote','Cancel_Request','Cancel_Replace_Request','Other_Inbound'})
-    msgs['Outbound'] = msgs['MessageType'].isin({'Execution_Report','Cancel_Reject','Other_Reject','Other_Outbound'})
+    # The direction of a message follows from its UnifiedMessageType code:
+    # Gateway types are inbound and ME types are outbound.
+    msgs['Inbound'] = umt_inbound[umt_codes_msgs]
+    msgs['Outbound'] = umt_outbound[umt_codes_msgs]
     ###################################
     ### ADDING EVENT CLASSIFICATION ###
     ###################################
@@ -381,15 +614,24 @@ def classify_messages(runtime, date, sym, args, paths):
     logger.info('Adding event classifications...')
 
     # Initialize classification and other message variables
+    # The variables are kept in NumPy arrays indexed by message position while looping 
+    # over messages, and are added to msgs once all messages are classified.
+    n_msgs = msgs.shape[0]
+    event_vars = {}
     for side in ['', 'Bid', 'Ask']:
-        msgs['Prev%sPriceLvl' % side] = np.nan # Previous price level (for C/R)
-        msgs['Prev%sQty' % side] = np.nan # Previous qty (for C/R, C)
-        msgs['%sPriceLvl' % side] = np.nan # Price level
-        msgs['%sCategorized' % side] = False # Indicator for whether message has been classified
-        msgs['%sEventNum' % side] = np.nan # Event number
-        msgs['%sEvent' % side] = '' # Event classification. Empty string for missing value
-        msgs['%sMinExecPriceLvl' % side] = np.nan  # Minimum price at which order executes
-        msgs['%sMaxExecPriceLvl' % side] = np.nan  # Maximum price at which order executes
+        event_vars['Prev%sPriceLvl' % side] = np.full(n_msgs, np.nan) # Previous price level (for C/R)
+        event_vars['Prev%sQty' % side] = np.full(n_msgs, np.nan) # Previous qty (for C/R, C)
+        event_vars['%sPriceLvl' % side] = np.full(n_msgs, np.nan) # Price level
+        event_vars['%sCategorized' % side] = np.zeros(n_msgs, dtype=bool) # Indicator for whether message has been classified
+        event_vars['%sEventNum' % side] = np.full(n_msgs, -1, dtype=np.int32) # Event number. -1 for missing value
+        event_vars['%sEvent' % side] = np.full(n_msgs, EV_NONE, dtype=np.int16) # Event classification code. EV_NONE for missing value
+        event_vars['%sMinExecPriceLvl' % side] = np.full(n_msgs, np.nan)  # Minimum price at which order executes
+        event_vars['%sMaxExecPriceLvl' % side] = np.full(n_msgs, np.nan)  # Maximum price at which order executes
+
+    # Prices as float arrays (NaN for missing) for scalar access within the loops
+    limit_price = msgs['LimitPrice'].to_numpy()
+    executed_price = msgs['ExecutedPrice'].to_numpy()
+    quote_price = {S: msgs['%sPrice' % S].to_numpy() for S in ['Bid', 'Ask']}
 
     # Initialize Testing Counters
     # Those counters are used to monitor corner cases and are printed in the log file
@@ -423,8 +665,8 @@ def classify_messages(runtime, date, sym, args, paths):
     quote_testing_counter['cancel_other_me'       ] = 0 # Cancel Other ME activity
     quote_testing_counter['other_me_activity'     ] = 0 # Lone ME responses that aren't otherwise accounted for
 
-    ### Loop over users and orders to classify messages into events ###
-    # For each user we first loop over each order (quotes are processed separately) and classify its messages in Events.
+    ### Loop over orders and users to classify messages into events ###
+    # We first loop over each order (quotes are processed separately) and classify its messages in Events.
     # Then, for each user, we loop over all quote related messages and classify them in Events. 
     # 
     # We classify inbound messages according to their UnifiedMessageType and the UnifiedMessageType of the 
@@ -432,1161 +674,1202 @@ def classify_messages(runtime, date, sym, args, paths):
     # as a passive execution or 'Other ME activity'. 'Other ME activity' also catches corner cases like  
     # Business Rejects or packet loss (missing inbound message)
     #
-    # The structure of the loop is as follows:
-    # for each user:
-    #     for each order submitted by that user:
+    # The structure of the loops is as follows:
+    # for each order (the orders of all users, as contiguous slices of the messages 
+    #                 stable-sorted by UserID and UniqueOrderID):
+    #     Initialize event counter. 
+    #     for each message in the order:
+    #         Skip the message if it is already classified.
+    #         Depending on the message type: increment event counter; populate some message variables; if necessary, 
+    #         loop over subsequent messages to identify messages associated to the message currently looping over
+    #         and populate some message variables for those associated messages; assign the same event number to 
+    #         the message looping over and its associated messages; and mark them as classified.
+    # for each user with quote related messages:
+    #     for each side:
     #         Initialize event counter. 
-    #         for each message in the order:
+    #         for each quote message of the user:
     #             Skip the message if it is already classified.
     #             Depending on the message type: increment event counter; populate some message variables; if necessary, 
     #             loop over subsequent messages to identify messages associated to the message currently looping over
     #             and populate some message variables for those associated messages; assign the same event number to 
     #             the message looping over and its associated messages; and mark them as classified.
-    #     for quote:
-    #         for each side:
-    #             Initialize event counter. 
-    #             for each quote message:
-    #                 Skip the message if it is already classified.
-    #                 Depending on the message type: increment event counter; populate some message variables; if necessary, 
-    #                 loop over subsequent messages to identify messages associated to the message currently looping over
-    #                 and populate some message variables for those associated messages; assign the same event number to 
-    #                 the message looping over and its associated messages; and mark them as classified.
     
-    for _, user_msgs in msgs.groupby('UserID'):
+    # UnifiedMessageType codes of the messages, as a list for fast scalar access within the loops.
+    # msgs has the default RangeIndex from read_csv, so index labels are also positions.
+    # The loops rely on this (and on the index being in message order) to walk messages by position.
+    assert msgs.index.equals(pd.RangeIndex(n_msgs)), 'Symbol-Date (%s, %s): message index is not a RangeIndex' % (date, sym)
+    umt = umt_codes_msgs.tolist()
+    # MessageType and Side codes of the messages (positions in message_types and sides), 
+    # compared as integers within the loops rather than as strings
+    msg_type = pd.Categorical(msgs['MessageType'], categories=message_types).codes.tolist()
+    msg_side = pd.Categorical(msgs['Side'], categories=sides).codes.tolist()
+    # Other fields read within the loops, as lists for the same reason
+    client_order_id = msgs['ClientOrderID'].tolist()
+    leaves_qty = msgs['LeavesQty'].tolist()
+    quote_size = {S: msgs['%sSize' % S].tolist() for S in ['Bid', 'Ask']}
+
+    # Classification variables for orders
+    event, event_num, categorized = event_vars['Event'], event_vars['EventNum'], event_vars['Categorized']
+    price_lvl, prev_price_lvl, prev_qty = event_vars['PriceLvl'], event_vars['PrevPriceLvl'], event_vars['PrevQty']
+    min_exec_price_lvl, max_exec_price_lvl = event_vars['MinExecPriceLvl'], event_vars['MaxExecPriceLvl']
+
+    ## Orders
+    # Orders of different users are independent, so the messages of each order (i.e. messages 
+    # that are not quote related with the same UserID and UniqueOrderID) are grouped with a 
+    # single stable sort rather than with nested groupby's over users and orders. 
+    # After sorting, the messages of each order form a contiguous slice of order_index, 
+    # in their original order. The boundaries of the slices are order_starts and order_ends.
+    order_rows = (~msgs['QuoteRelated'] & msgs['UserID'].notna() & msgs['UniqueOrderID'].notna()).to_numpy()
+    user_codes, _ = pd.factorize(msgs.loc[order_rows, 'UserID'])
+    uoid_codes, uoids = pd.factorize(msgs.loc[order_rows, 'UniqueOrderID'])
+    order_keys = user_codes.astype(np.int64) * len(uoids) + uoid_codes
+    order_sort = np.argsort(order_keys, kind='stable')
+    order_index = msgs.index.to_numpy()[order_rows][order_sort]
+    order_starts = np.flatnonzero(np.diff(order_keys[order_sort], prepend=-1)).tolist()
+    order_ends = order_starts[1:] + [len(order_index)]
+    # The loops below walk positions of order_index, so it is kept as a list for fast scalar access.
+    order_index = order_index.tolist()
+
+    # Loop over orders that are not quote related
+    for start, end in zip(order_starts, order_ends):
+
+        counter = 0  # Initialize event counter
+
+        # Order state (as in OrderBook.Orders.Order), kept in local variables:
+        # gw_prc is the price of the last gateway message, me_prc/me_qty are the price/quantity
+        # as of the last ME message, and cancel_prc/cancel_qty are the price/quantity
+        # before the last cancel or cancel/replace.
+        gw_prc = me_prc = me_qty = cancel_prc = cancel_qty = np.nan
+
+        # Loop over messages
+        for i_pos in range(start, end):
+            i = order_index[i_pos]
+            umt_i = umt[i]
+            coid_i = client_order_id[i]
+
+            # Skip previously classified messages
+            if categorized[i]:
+                continue
+
+            # Gateway New Order
+            # This includes the following Unified Message Types:  
+            # 'Gateway New Order (Market)',  'Gateway New Order (Limit)', 
+            # 'Gateway New Order (IOC)', 'Gateway New Order (Stop)', 'Gateway New Order (Stop Limit)'
+            # 'Gateway New Order (Market)', 'Gateway New Order (Pegged)'
+            # and classifies message i into the following Events:
+            # 'New order accepted', 'New order aggressively executed in full', 'New order aggressively executed in part',
+            # 'New order expired', 'New order suspended', 'New order failed', 'New order no response'
+            # Note that for Event 'New order accepted', it can either be that the new order is posted to book, 
+            # or accepted to the auction queue (Good-for-Auction orders)
+            # We don't need to separate these two because GFA orders will be handled separately in the code.
+            # GFA orders will not update the order book or participate in races.
+            if msg_type[i] == MT_NEW_ORDER:
+                counter += 1  # Increment event counter
+                gw_prc = me_prc = me_qty = cancel_prc = cancel_qty = np.nan  # Reset order state
+                # Handle order types with price information
+                if (1 << umt_i) & PRICED_NEW_ORDER_MASK:
+                    gw_prc = limit_price[i]
+                # Handle order types without price information. This includes
+                # 'Gateway New Order (Market)', 'Gateway New Order (Stop)', 'Gateway New Order (Pegged)'
+                # They are separated because they don't have a limit price and they 
+                # participate in the trading in a slightly different way.
+                else: 
+                    gw_prc = np.nan
+                
+                event_num[i] = counter  # Populate EventNum
+                price_lvl[i] = gw_prc
+                categorized[i] = True  # Flag message i as categorized
+                resolved_i = False  # Initialize indicator for loop
+
+                # Loop over subsequent messages to assign the event to message i based on outbound messages
+                # of the following Unified Message Types:
+                # ME: New Order Accept, ME: Order Reject, ME: Partial Fill (P), ME: Partial Fill (A),
+                # ME: Full Fill (P), ME: Full Fill (A), ME: Order Expire, ME: Order Suspend,
+                # ME: Other Reject
+                for j_pos in range(i_pos + 1, end):
+                    j = order_index[j_pos]
+                    umt_j = umt[j]
+                    
+                    # Skip if message has already been categorized or if it has a different ClientOrderID value.
+                    # Gateway messages with the same ClientOrderID will not trigger any of the if statements in the j loop
+                    if categorized[j] or client_order_id[j] != coid_i:
+                        continue
 
-        # Loop over orders that are not quote related
-        for _, order_msgs in user_msgs[~user_msgs['QuoteRelated']].groupby('UniqueOrderID'):
+                    # ME New Order Accept
+                    if umt_j == UMT_ME_NEW_ORDER_ACCEPT:
+                        me_prc, me_qty = gw_prc, leaves_qty[j]
+                        event[i] = EV_NEW_ORDER_ACCEPTED  # Assign event to message i
+                        event_num[j] = counter # Populate EventNum
+                        price_lvl[j] = me_prc
+                        categorized[j] = True  # Flag message j as categorized
+                        resolved_i = True  # Update indicator
 
-            counter = 0  # Initialize event counter
+                    # ME Full Fill - (A) for aggressive
+                    elif umt_j == UMT_ME_FULL_FILL_AGGR:
+                        me_prc, me_qty = gw_prc, leaves_qty[j]
+                        event[i] = EV_NEW_ORDER_AGGRESSIVELY_EXECUTED_IN_FULL  # Assign event to message i
+                        min_exec_price_lvl[i] = executed_price[j]
+                        max_exec_price_lvl[i] = executed_price[j]
+                        event_num[j] = counter  # Populate EventNum
+                        price_lvl[j] = me_prc
+                        categorized[j] = True  # Flag message j as categorized
+                        resolved_i = True  # Update indicator
 
-            order = Order()
+                    # ME Partial Fill - (A) for aggressive
+                    # Loop over subsequent messages until the order is filled or fails
+                    elif umt_j == UMT_ME_PARTIAL_FILL_AGGR:
+                        me_prc, me_qty = gw_prc, leaves_qty[j]
+                        event_num[j] = counter  # Populate EventNum
+                        price_lvl[j] = me_prc
+                        categorized[j] = True  # Flag message as categorized
+                        min_exec_price = max_exec_price = executed_price[j]
+                        resolved_j = False  # Initialize indicator for loop
+
+                        for k_pos in range(j_pos + 1, end):
+                            k = order_index[k_pos]
+                            umt_k = umt[k]
+
+                            # Skip if message has already been categorized or ClientOrderID doesn't match
+                            # or message has different ClientOrderID value
+                            if categorized[k] or client_order_id[k] != coid_i:
+                                continue
 
-            # Loop over messages
-            for i in order_msgs.index:
+                            # ME Full Fill - (A) for aggressive
+                            if umt_k == UMT_ME_FULL_FILL_AGGR:
+                                me_prc, me_qty = gw_prc, leaves_qty[k]
+                                min_exec_price, max_exec_price = min(min_exec_price, executed_price[k]), max(max_exec_price, executed_price[k])
+                                event[i] = EV_NEW_ORDER_AGGRESSIVELY_EXECUTED_IN_FULL  # Assign event to message i
+                                min_exec_price_lvl[i] = min_exec_price
+                                max_exec_price_lvl[i] = max_exec_price
+                                event_num[k] = counter  # Populate EventNum
+                                price_lvl[k] = me_prc
+                                categorized[k] = True  # Flag message k as categorized
+                                resolved_j, resolved_i = True, True  # Update indicators
+
+                            # ME Partial Fill - (A) for aggressive
+                            elif umt_k == UMT_ME_PARTIAL_FILL_AGGR:
+                                me_prc, me_qty = gw_prc, leaves_qty[k]
+                                min_exec_price, max_exec_price = min(min_exec_price, executed_price[k]), max(max_exec_price, executed_price[k])
+                                event_num[k] = counter  # Populate
+                                price_lvl[k] = me_prc
+                                categorized[k] = True  # Flag message k as categorized
+                                resolved_j, resolved_i = False, False  # Do not update indicators
+
+                            # ME Order Expire for IOC messages that immediately cancelled the order 
+                            elif umt_k == UMT_ME_ORDER_EXPIRE and umt_i == UMT_GW_NEW_ORDER_IOC:
+                                me_prc, me_qty = gw_prc, np.nan
+                                event[i] = EV_NEW_ORDER_AGGRESSIVELY_EXECUTED_IN_PART  # Assign event to message i
+                                min_exec_price_lvl[i] = min_exec_price
+                                max_exec_price_lvl[i] = max_exec_price
+                                event_num[k] = counter  # Populate EventNum
+                                price_lvl[k] = me_prc
+                                categorized[k] = True  # Flag message k as categorized
+                                resolved_j, resolved_i = True, True  # Update indicators
+                            
+                            # ME New Order Accept after partial fills 
+                            # If the Matching Engine sends a post-to-book confirmation after an 
+                            # aggressive order is executed in part (the rest is posted to book),
+                            # then the loop will end up in this case. For example,
+                            # In the LSE data, since there is NO post-to-book confirmation after 
+                            # an aggressive order is executed in part, this case is not captured here. 
+                            # It is captured two blocks below in the No further ME Response
+                            # after partial fills case.
+                            elif umt_k == UMT_ME_NEW_ORDER_ACCEPT:
+                                me_prc, me_qty = gw_prc, leaves_qty[k]
+                                min_exec_price, max_exec_price = min(min_exec_price, executed_price[k]), max(max_exec_price, executed_price[k])
+                                event[i] = EV_NEW_ORDER_AGGRESSIVELY_EXECUTED_IN_FULL  # Assign event to message i
+                                min_exec_price_lvl[i] = min_exec_price
+                                max_exec_price_lvl[i] = max_exec_price
+                                event_num[k] = counter  # Populate EventNum
+                                price_lvl[k] = me_prc
+                                categorized[k] = True  # Flag message k as categorized
+                                resolved_j, resolved_i = True, True  # Update indicators
+
+                            # Other ME Message 
+                            # When observing other ME messages following the passive fills, 
+                            # the current event at least one passive fill is ended.
+                            # This case includes, for instance, a new order aggressively executed in part
+                            # and then the remaining part rests in the book and after that, it is executed
+                            # passively. These passive fills end the current event and will be classified
+                            # into other events.
+                            elif msg_type[k] == MT_EXECUTION_REPORT:
+                                event[i] = EV_NEW_ORDER_AGGRESSIVELY_EXECUTED_IN_PART  # Assign event to message i
+                                min_exec_price_lvl[i] = min_exec_price
+                                max_exec_price_lvl[i] = max_exec_price
+                                resolved_j, resolved_i = True, True  # Update indicators
+                                order_testing_counter['partial_other_me'] += 1 # test counter
+
+                            if resolved_j:
+                                break
 
-                # Skip previously classified messages
-                if msgs.at[i, 'Categorized']:
+                        # No further ME Response after partial fills
+                        # In cases where there are no further outbound messages after the partial fill
+                        # This could be that an order is executed aggressively in part
+                        # and then stays in the order book for the rest of the day, or packet loss. 
+                        # Since an aggressive partial fill message is already observed, the event is  
+                        # categorized as aggressive partial fill.
+                        # For instance, in the LSE data, after the new order is aggressively executed in part, 
+                        # the rest of the order will be posted to book but there will NOT be a post to book message.
+                        # Hence if we see no further ME response after partial fills, we assume they will be
+                        # posted to book. If the data has this post-to-book message after partial fills, 
+                        # the same code logic still applies, except that we will end up observing 
+                        # ME New Order Accept after partial fills (two blocks above) since we will see 
+                        # a post-to-book confirmation after partial execution. 
+                        if not resolved_j:
+                            event[i] = EV_NEW_ORDER_AGGRESSIVELY_EXECUTED_IN_PART  # Assign event to message i
+                            min_exec_price_lvl[i] = min_exec_price
+                            max_exec_price_lvl[i] = max_exec_price
+                            order_testing_counter['pf_no_further_reply'] += 1 # test counter
+                            resolved_i = True  # Update indicator
+
+                    # ME Order Expire
+                    elif umt_j == UMT_ME_ORDER_EXPIRE:
+                        me_prc, me_qty = gw_prc, np.nan
+                        event[i] = EV_NEW_ORDER_EXPIRED  # Assign event to message i
+                        event_num[j] = counter  # Populate EventNum
+                        price_lvl[j] = me_prc
+                        categorized[j] = True  # Flag message j as categorized
+                        resolved_i = True  # Update indicator
+
+                    # ME Order Reject
+                    elif (1 << umt_j) & ORDER_REJECT_MASK:
+                        me_prc, me_qty = gw_prc, np.nan
+                        event[i] = EV_NEW_ORDER_FAILED  # Assign event to message i
+                        event_num[j] = counter  # Populate EventNum
+                        price_lvl[j] = me_prc
+                        categorized[j] = True  # Flag message j as categorized
+                        resolved_i = True  # Update indicator
+
+                    # ME Order Suspend
+                    elif umt_j == UMT_ME_ORDER_SUSPEND:
+                        me_prc, me_qty = gw_prc, leaves_qty[j]
+                        event[i] = EV_NEW_ORDER_SUSPENDED  # Assign event to message i
+                        event_num[j] = counter  # Populate EventNum
+                        price_lvl[j] = me_prc
+                        categorized[j] = True  # Flag message j as categorized
+                        resolved_i = True  # Update indicator
+                    
+                    else:
+                        # counter if other ME message after new order inbound
+                        order_testing_counter['nocr_other_me'] += 1 
+
+                    if resolved_i:
+                        break
+
+                # No ME Response (corner cases)
+                # The inbound message has no Accept, Fill, Expire, Reject or Suspend outbound message 
+                if not resolved_i:
+                    # Counter for new order no response
+                    order_testing_counter['no_no_reply'] += 1
+                    event[i] = EV_NEW_ORDER_NO_RESPONSE  # Assign event to message i
+                    resolved_i = True  # Update indicator
+
+            # Gateway Cancel
+            # This includes the following Type:  'Gateway Cancel'
+            # and classifies message i in the following Events:
+            # 'Cancel request accepted', 'Cancel request rejected', 'Cancel request failed', 'Cancel request no response'
+            # The difference between cancel request rejected and failed is that:
+            #     - Cancel request rejected: If a ME: Cancel Reject (TLTC) outbound is observed.
+            #                                This is the failed cancel cases we use in the race detection section.
+            #     - Cancel request failed: If the cancel request is rejected by other reasons,
+            #                              that is, 'ME: Cancel Reject (Other)' or 'ME: Other Reject'.
+            #                              This does NOT count as failed cancels we define in the race detection section
+            elif msg_type[i] == MT_CANCEL_REQUEST:
+                counter += 1  # Increment event counter
+                event_num[i] = counter  # Populate EventNum
+                prev_price_lvl[i] = gw_prc  # Assume cancel affects last submitted GW message
+                categorized[i] = True  # Flag message i as categorized
+                resolved_i = False  # Initialize indicator for loop
+
+                # Loop over subsequent messages to assign the event to message i based on outbound messages
+                # of the following Unified Message Types:
+                # 'ME: Cancel Accept', 'ME: Cancel Reject (TLTC)',
+                # 'ME: Cancel Reject (Other)', 'ME: Other Reject'
+                for j_pos in range(i_pos + 1, end):
+                    j = order_index[j_pos]
+                    umt_j = umt[j]
+
+                    # Skip if message has already been categorized or if it has a different ClientOrderID value.
+                    # Gateway messages with the same ClientOrderID will not trigger any of the if statements in the j loop.
+                    if categorized[j] or client_order_id[j] != coid_i:
+                        continue
+
+                    # ME Cancel Accept, ME Cancel Reject (TLTC), ME Other Cancel Reject
+                    # The event is looked up from the UnifiedMessageType of message j.
+                    # All three replies record the order price and quantity before the cancel, 
+                    # and a cancel accept also removes the remaining quantity.
+                    cancel_event = cancel_reply_events[umt_j]
+                    if cancel_event != EV_NONE:
+                        cancel_prc, cancel_qty = gw_prc, me_qty
+                        if cancel_event == EV_CANCEL_REQUEST_ACCEPTED:
+                            me_qty = np.nan
+                        event[i] = cancel_event  # Assign event to message
+                        event_num[j] = counter  # Populate EventNum
+                        prev_price_lvl[j] = cancel_prc
+                        prev_qty[i] = cancel_qty
+                        categorized[j] = True  # Flag message j as categorized
+                        resolved_i = True  # Update indicator
+
+                    # Break loop if message resolves the event
+                    if resolved_i:
+                        break
+                    else:
+                        # Counter for other ME activity after cancel inbound
+                        order_testing_counter['cancel_other_me'] += 1
+
+                # Classify unresolved events as no response
+                if not resolved_i:
+                    order_testing_counter['cancel_no_reply'] += 1 # cancel message but no ME response
+                    event[i] = EV_CANCEL_NO_RESPONSE  # Assign event to message i
+                    resolved_i = True  # Update indicator
+
+            # Gateway Cancel/Replace
+            # This includes the following Type:  'Gateway Cancel/Replace'
+            # and classifies message i in the following Events:
+            # 'Cancel/replace request aggr executed in full', 'Cancel/replace request rejected', 
+            # 'Cancel/replace request failed', 'Cancel/replace request no response'
+            # The difference between cancel/replace request rejected and failed is similar to 
+            # that of cancel request rejected and failed. 
+            # Only Cancel/replace request rejected is counted as failed cancels in race detection.
+            elif msg_type[i] == MT_CANCEL_REPLACE_REQUEST:
+                counter += 1  # Increment event counter
+                cancel_prc, cancel_qty, gw_prc = gw_prc, me_qty, limit_price[i]
+                event_num[i] = counter  # Populate EventNum
+                prev_price_lvl[i] = cancel_prc
+                price_lvl[i] = gw_prc
+                categorized[i] = True  # Flag message i as categorized
+                resolved_i = False  # Initialize indicator for loop
+
+                # Loop over subsequent messages
+                for j_pos in range(i_pos + 1, end):
+                    j = order_index[j_pos]
+                    umt_j = umt[j]
+
+                    # Skip if message j has already been categorized
+                    # or message j has different ClientOrderID value than message i
+                    if categorized[j] or client_order_id[j] != coid_i:
+                        continue
+
+                    # ME Cancel/Replace Accept
+                    if umt_j == UMT_ME_CANCEL_REPLACE_ACCEPT:
+                        me_prc, me_qty = gw_prc, leaves_qty[j]
+                        event_num[j] = counter  # Populate EventNum
+                        prev_price_lvl[j] = cancel_prc
+                        prev_qty[i] = cancel_qty
+                        price_lvl[j] = me_prc
+                        categorized[j] = True  # Flag message j as categorized
+                        resolved_j = False  # Initialize indicators for loop
+                        partially_filled = False  # Indicator for aggressive partial fills after the accept
+
+                        # Loop over subsequent messages
+                        # The messages after the accept are scanned once. After the first aggressive partial fill
+                        # the scan continues to collect further fills until the event is completed by a full fill,
+                        # by another ME message or by the end of the order's messages.
+                        for k_pos in range(j_pos + 1, end):
+                            k = order_index[k_pos]
+                            umt_k = umt[k]
+
+                            # Skip if message is not an uncategorized response
+                            # or message k has different ClientOrderID value than message i
+                            if categorized[k] or client_order_id[k] != coid_i:
+                                continue
+
+                            # ME Full Fill - (A) for aggressive
+                            if umt_k == UMT_ME_FULL_FILL_AGGR:
+                                me_prc, me_qty = gw_prc, leaves_qty[k]
+                                if partially_filled:
+                                    min_exec_price, max_exec_price = min(min_exec_price, executed_price[k]), max(max_exec_price, executed_price[k])
+                                else:
+                                    min_exec_price = max_exec_price = executed_price[j]
+                                event[i] = EV_CANCEL_REPLACE_REQUEST_AGGR_EXECUTED_IN_FULL  # Assign event to message i
+                                min_exec_price_lvl[i] = min_exec_price
+                                max_exec_price_lvl[i] = max_exec_price
+                                event_num[k] = counter  # Populate EventNum
+                                price_lvl[k] = me_prc
+                                categorized[k] = True # Flag message k as categorized
+                                resolved_j, resolved_i = True, True  # Update indicators
+
+                            # ME Partial Fill - (A) for aggressive
+                            # Do not assign event to message i yet
+                            elif umt_k == UMT_ME_PARTIAL_FILL_AGGR:
+                                me_prc, me_qty = gw_prc, leaves_qty[k]
+                                if partially_filled:
+                                    min_exec_price, max_exec_price = min(min_exec_price, executed_price[k]), max(max_exec_price, executed_price[k])
+                                else:
+                                    min_exec_price = max_exec_price = executed_price[k]
+                                    partially_filled = True
+                                event_num[k] = counter  # Populate EventNum
+                                price_lvl[k] = me_prc
+                                categorized[k] = True  # Flag message k as categorized
+
+                            # Other ME Message
+                            # This includes any Execution Report for an inbound message that relates to a different Event.
+                            # These messages mark the end of the current event.
+                            # No EventNum assigned to k as in this case the message is related to a different Event.
+                            # If aggressive partial fills were observed, the event is C/R aggressively executed in part
+                            # e.g. passive fills after some aggressive partial fills (the order executed aggressively
+                            # in part and then traded passively after resting in the book for a while).
+                            # Otherwise, since the cancel/replace accept message is already observed, the event is C/R accepted.
+                            # NOTE: In principle C/R accept may trigger a suspend (if the stop price is affected), 
+                            # expire (such as by SEP - Self Execution Prevention, client can set to prevent execution between 
+                            # her own orders), or reject, that is, the order is suspended after being accepted.
+                            # The code will treat the ME message in such cases (e.g. suspend, expire, etc. after the C/R accept)
+                            # as part of an 'Other ME activity' and the current event is still C/R accepted.
+                            elif msg_type[k] == MT_EXECUTION_REPORT:
+                                if partially_filled:
+                                    event[i] = EV_CANCEL_REPLACE_REQUEST_AGGR_EXECUTED_IN_PART  # Assign event to message i
+                                    min_exec_price_lvl[i] = min_exec_price
+                                    max_exec_price_lvl[i] = max_exec_price
+                                    order_testing_counter['partial_other_me'] += 1
+                                else:
+                                    event[i] = EV_CANCEL_REPLACE_REQUEST_ACCEPTED  # Assign event to message i
+                                resolved_j, resolved_i = True, True  # Update indicators
+
+                            if resolved_j:
+                                break
+
+                        # No further ME Response
+                        # If an aggressive partial fill is already observed, the event is C/R aggressively executed in part
+                        # e.g. aggressively executed in part then posted to book and wait for 
+                        # passive execution. Note that no post-to-book message will be generated 
+                        # by the LSE matching engine in this case.
+                        # Otherwise the event is C/R accepted.
+                        if not resolved_j:
+                            if partially_filled:
+                                event[i] = EV_CANCEL_REPLACE_REQUEST_AGGR_EXECUTED_IN_PART  # Assign event to message i
+                                min_exec_price_lvl[i] = min_exec_price
+                                max_exec_price_lvl[i] = max_exec_price
+                            else:
+                                event[i] = EV_CANCEL_REPLACE_REQUEST_ACCEPTED  # Assign event to message i
+                            resolved_i = True  # Update indicator
+
+                    # ME Cancel Reject
+                    elif umt_j == UMT_ME_CANCEL_REJECT_TLTC:
+                        event[i] = EV_CANCEL_REPLACE_REQUEST_REJECTED
+                        event_num[j] = counter  # Populate EventNum
+                        prev_price_lvl[j] = cancel_prc
+                        prev_qty[i] = cancel_qty
+                        price_lvl[j] = me_prc
+                        categorized[j] = True  # Flag message j as categorized
+                        resolved_i = True
+
+                    # ME Other Reject
+                    elif (1 << umt_j) & CANCEL_FAIL_MASK:
+                        event[i] = EV_CANCEL_REPLACE_REQUEST_FAILED
+                        prev_price_lvl[j] = cancel_prc
+                        prev_qty[i] = cancel_qty
+                        price_lvl[j] = me_prc
+                        categorized[j] = True  # Flag message j as categorized
+                        resolved_i = True
+                        
+                    else:
+                        # other ME message after CR inbound
+                        order_testing_counter['nocr_other_me'] += 1
+
+                    if resolved_i:
+                        break
+
+                # No ME Response (corner case) 
+                # No related outbound message for the C/R inbound
+                if not resolved_i:
+                    # Counter for no reply after cancel replace inbound
+                    order_testing_counter['cr_no_reply'] += 1
+                    event[i] = EV_CANCEL_REPLACE_NO_RESPONSE  # Assign event to message i
+                    resolved_i = True  # Update indicator
+
+            # Gateway Other Inbound
+            # This includes the following Type: 'Other_Inbound'
+            # and classifies message i in  the following Events:
+            # 'Other Gateway activity'
+            elif msg_type[i] == MT_OTHER_INBOUND:
+                counter += 1
+                event[i] = EV_OTHER_GATEWAY_ACTIVITY
+                event_num[i] = counter
+                categorized[i] = True
+            
+            # Execution Report
+            # Passive, other fills and reject cases for outbounds
+            # These messages refer to orders passively executed and 
+            # to outbound messages with missing inbound messages (packet loss)
+            # This includes the following Type: 
+            # 'ME: Partial Fill (P)', 'ME: Full Fill (P)', 
+            # 'ME: Partial Fill (Other)', 'ME: Full Fill (Other)', 
+            # 'ME: Cancel Accept', 'ME: Cancel/Replace Accept', 
+            # and classifies message i in the following Events:
+            # 'Other ME activity', 
+            # 'Order passively executed in part', 'Order passively executed in full', 
+            # 'Order executed in part (other)', 'Order executed in full (other)'
+            elif msg_type[i] == MT_EXECUTION_REPORT:
+
+                counter += 1  # Increment event counter
+
+                # Partial passive execution - (P) for Passive 
+                if umt_i == UMT_ME_PARTIAL_FILL_PASSIVE:
+                    me_qty = leaves_qty[i]
+                    event[i] = EV_ORDER_PASSIVELY_EXECUTED_IN_PART  # Assign event to message i
+                    event_num[i] = counter  # Populate EventNum for message i
+                    price_lvl[i] = me_prc
+                    categorized[i] = True  # Flag message i as categorized
+
+                # Full passive execution - (P) for Passive 
+                elif umt_i == UMT_ME_FULL_FILL_PASSIVE:
+                    me_qty = np.nan
+                    event[i] = EV_ORDER_PASSIVELY_EXECUTED_IN_FULL  # Assign event to message i
+                    event_num[i] = counter  # Populate EventNum for message i
+                    price_lvl[i] = me_prc
+                    categorized[i] = True  # Flag message i as categorized
+
+                # Other partial execution
+                elif umt_i == UMT_ME_PARTIAL_FILL_OTHER:
+                    me_prc, me_qty = gw_prc, leaves_qty[i]
+                    event[i] = EV_ORDER_EXECUTED_IN_PART_OTHER # Assign event to message i
+                    event_num[i] = counter  # Populate EventNum for message i
+                    price_lvl[i] = me_prc
+                    categorized[i] = True # Flag message i as categorized
+
+                # Other full execution
+                elif umt_i == UMT_ME_FULL_FILL_OTHER:
+                    me_prc, me_qty = gw_prc, np.nan
+                    event[i] = EV_ORDER_EXECUTED_IN_FULL_OTHER  # Assign event to message i
+                    event_num[i] = counter  # Populate EventNum for message i
+                    price_lvl[i] = me_prc
+                    categorized[i] = True  # Flag message i as categorized
+
+                # Other cancel accept (NOTE: For missing GW msg due to packet loss.)
+                elif umt_i == UMT_ME_CANCEL_ACCEPT:
+                    me_prc, me_qty = gw_prc, leaves_qty[i]
+                    event[i] = EV_OTHER_ME_ACTIVITY
+                    event_num[i] = counter
+                    prev_price_lvl[i] = me_prc
+                    categorized[i] = True
+                    order_testing_counter['other_me_activity'] += 1 # testing counter
+
+                # Other cancel/replace accept (For missing GW msg due to packet loss.)
+                elif umt_i == UMT_ME_CANCEL_REPLACE_ACCEPT:
+                    prev_price_lvl[i] = me_prc
+                    cancel_prc, cancel_qty, gw_prc = gw_prc, me_qty, np.nan
+                    me_prc, me_qty = gw_prc, leaves_qty[i]
+                    event[i] = EV_OTHER_ME_ACTIVITY
+                    event_num[i] = counter  # Populate EventNum
+                    categorized[i] = True  # Flag message j as categorized
+                    order_testing_counter['other_me_activity'] += 1 # testing counter
+                    
+                # ME Order Expire
+                elif umt_i == UMT_ME_ORDER_EXPIRE:
+                    me_prc, me_qty = gw_prc, np.nan
+                    event[i] = EV_OTHER_ME_ACTIVITY  # Assign event to message i
+                    event_num[i] = counter  # Populate EventNum
+                    price_lvl[i] = me_prc
+                    categorized[i] = True  # Flag message j as categorized
+
+                # Other ME activity
+                else:
+                    me_prc, me_qty = gw_prc, leaves_qty[i]
+                    event[i] = EV_OTHER_ME_ACTIVITY
+                    event_num[i] = counter
+                    categorized[i] = True
+                    order_testing_counter['other_me_activity'] += 1 # testing counter
+
+            # Other outbound cases 
+            # For other outbound cases where an inbound cannot be found (packet loss), 
+            # we classify them into 'Other ME activity' here. If their inbounds could be
+            # found, we would have already categorized them in the previous sections.
+            # This includes the following Type of outbound: 
+            # 'ME: Cancel Reject (TLTC)', 'ME: Cancel Reject (Other), 
+            # 'ME: Other Reject',
+            # and classifies message i in the following Events:
+            # 'Other ME activity' 
+            elif (1 << umt_i) & NON_EXECUTION_OUTBOUND_MASK:
+                counter += 1
+                event[i] = EV_OTHER_ME_ACTIVITY
+                event_num[i] = counter
+                categorized[i] = True
+                order_testing_counter['other_me_activity'] += 1
+
+    ## Quotes
+    # Note that for data from exchanges without quotes, simply set QuoteRelated to False
+    # for all messages and this section will be automatically skipped.
+    # 
+    # A quote is different from an order:
+    #     1. A quote is a two-sided, executable, limit order valid for the day.
+    #     2. Only qualified users (market makers) can use quote and each 
+    #        user can only have one active quote at a time.
+    #     3. When one side of the quote is fully filled, 
+    #        the other side will NOT be cancelled automatically.
+    # 
+    # Some quote related messages can have effect on one or two sides while others can only 
+    # have effects on both sides:
+    #     1. New_Quote message when there is no active quote from the user: act on both sides only.
+    #     2. New_Quote message to modify an existing quote: act on one or two sides.
+    #     3. Cancel_Request: act on both sides (one can only cancel both sides of the quote).
+    #     4. Rejects: when a New_Quote is rejected, it is rejected on both sides.
+    # 
+    # Loop over quote related messages on each side
+    # Inbound messages only trigger outbound messages on the side (or sides) that they update. 
+    # It is possible to see a quote related inbound but there is no outbound on one side
+    # because that inbound only has an effect on one side.
+    # An outbound on one side is expected if the quote changes the price/quantity of that side
+    # or updates from missing. We look for the outbound message only if we expect there is an 
+    # outbound on that side. This is because we need to know whether missing an outbound on 
+    # one side is normal (because the quote inbound does not affect this side), 
+    # or due to packet loss.
+    #
+    # Simple Quote Example (Common Case) - 'Quote Updated' Event using 'Gateway New Quote' that outbounds 'ME: Cancel/Replace Accept'
+    # 
+    #     Action: Participant sent Gateway New Order (MessageType == 'New_Quote') with an updated bid/ask quote and the ME 
+    #             cancelled the previous quote and replaced it with the new bid/ask quote
+    # 
+    #     Event Classification process:
+    # 
+    #         Summary: Loop over messages until we get to our inbound Gateway New Quote message and then we check the 
+    #                  subsequent messages until we find an outbound 'ME: Cancel/Replace Accept' message. We assign both messages
+    #                  to the same EventNum and label the Event 'Native Quote Updated'
+    # 
+    #         1. Loop over msgs for the user on Bid and Ask sides until you get to the new quote message
+    #         2. Check that MessageType == 'New_Quote' and whether the message has already been categorized
+    #         3. Assign an EventNum to the message and set Categorized to True
+    #         4. Loop over subsequent messages. For each subsequent message, check if we expect a ME response and whether the 
+    #            new message has already been categorized
+    #         5. Check new messages' UnifiedMessageType until UnifiedMessageType == 'ME: Cancel/Replace Accept' 
+    #         6. Then, assign the inbound quote message EventNum to the new message (they are now part of the same Event),
+    #            and set the Event of the inbound message to 'Native Quote Updated'
+    #         7. Terminate the second loop, and move on to the next message
+    # 
+    #       Result: The inbound 'Gateway New Quote' message and the outbound 'ME: Cancel/Replace Accept' message form an Event 
+    #               labeled 'Native Quote Updated' with number EventNum.
+    #
+    # The quote related messages of each user are grouped with a single stable sort by UserID 
+    # rather than with a groupby over users. After sorting, the messages of each user form a 
+    # contiguous slice of quote_index, in their original order. The boundaries of the slices
+    # are found by np.searchsorted on the sorted user codes.
+    quote_rows = (msgs['QuoteRelated'] & msgs['UserID'].notna()).to_numpy()
+    quote_user_codes, quote_users = pd.factorize(msgs.loc[quote_rows, 'UserID'])
+    quote_sort = np.argsort(quote_user_codes, kind='stable')
+    quote_index = msgs.index.to_numpy()[quote_rows][quote_sort]
+    quote_bounds = np.searchsorted(quote_user_codes[quote_sort], np.arange(len(quote_users) + 1)).tolist()
+    # The loops below walk positions of quote_index, so it is kept as a list for fast scalar access.
+    quote_index = quote_index.tolist()
+
+    # Loop over users with quote related messages
+    for start, end in zip(quote_bounds[:-1], quote_bounds[1:]):
+
+        # Loop over both Sides as each quote can update one side or both sides.
+        # Categorize Bid and Ask events separately
+        for S in ['Bid', 'Ask']:
+
+            counter = 0 # Initialize event counter
+
+            quote = Quote()
+
+            # Classification variables and prices of side S
+            side_event, side_event_num, side_categorized = event_vars['%sEvent' % S], event_vars['%sEventNum' % S], event_vars['%sCategorized' % S]
+            side_price_lvl, side_prev_price_lvl, side_prev_qty = event_vars['%sPriceLvl' % S], event_vars['Prev%sPriceLvl' % S], event_vars['Prev%sQty' % S]
+            side_min_exec_price_lvl, side_max_exec_price_lvl = event_vars['%sMinExecPriceLvl' % S], event_vars['%sMaxExecPriceLvl' % S]
+            side_price, side_size = quote_price[S], quote_size[S]
+            # Side codes of side S and of the opposite side, to compare with msg_side
+            side_code, op_side = sides.index(S), sides.index(opposite(S))
+
+            for i_pos in range(start, end):
+                i = quote_index[i_pos]
+                umt_i = umt[i]
+                coid_i = client_order_id[i]
+
+                # Skip previously categorized messages
+                if side_categorized[i]:
                     continue
 
-                # Gateway New Order
-                # This includes the following Unified Message Types:  
-                # 'Gateway New Order (Market)',  'Gateway New Order (Limit)', 
-                # 'Gateway New Order (IOC)', 'Gateway New Order (Stop)', 'Gateway New Order (Stop Limit)'
-                # 'Gateway New Order (Market)', 'Gateway New Order (Pegged)'
-                # and classifies message i into the following Events:
-                # 'New order accepted', 'New order aggressively executed in full', 'New order aggressively executed in part',
-                # 'New order expired', 'New order suspended', 'New order failed', 'New order no response'
-                # Note that for Event 'New order accepted', it can either be that the new order is posted to book, 
-                # or accepted to the auction queue (Good-for-Auction orders)
-                # We don't need to separate these two because GFA orders will be handled separately in the code.
-                # GFA orders will not update the order book or participate in races.
-                if order_msgs.at[i, 'MessageType'] == 'New_Order':
+                # Gateway New Quote
+                # This includes the following Unified Message Types:  'Gateway New Quote'
+                # and classifies message i in the following Events:
+                # 'New quote accepted', 'New quote updated', 
+                # 'New quote aggressively executed in full',
+                # 'New quote aggressively executed in part', 
+                # 'New quote expired', 'New quote failed',
+                # 'New quote suspended', 'New quote no response'
+                elif msg_type[i] == MT_NEW_QUOTE:
+                    quote.update(side_price[i], side_size[i])
+                    quote.update_expectations()
                     counter += 1  # Increment event counter
-                    order = Order()
-                    # Handle order types with price information
-                    if msgs.at[i, 'UnifiedMessageType'] in ('Gateway New Order (Limit)', 
-                                                          'Gateway New Order (IOC)',  
-                                                          'Gateway New Order (Stop Limit)',
-                                                          'Gateway New Order (Passive Only)',
-                                                          'Gateway New Order (Other)'):
-                        order.add(p=msgs.at[i, 'LimitPrice'], q=msgs.at[i, 'OrderQty'])
-                    # Handle order types without price information. This includes
-                    # 'Gateway New Order (Market)', 'Gateway New Order (Stop)', 'Gateway New Order (Pegged)'
-                    # They are separated because they don't have a limit price and they 
-                    # participate in the trading in a slightly different way.
-                    else: 
-                        order.add(p=np.nan, q=msgs.at[i, 'OrderQty'])
-                    
-                    msgs.at[i, 'EventNum'] = counter  # Populate EventNum
-                    msgs.at[i, 'PriceLvl'] = order.gw_prc
-                    msgs.at[i, 'Categorized'] = True  # Flag message i as categorized
+                    pcounter = counter # counter for passive events
+                    side_event_num[i] = counter  # Populate EventNum
+                    side_prev_price_lvl[i] = quote.cancel_prc
+                    side_price_lvl[i] = quote.gw_prc
+                    side_categorized[i] = True # Flag message i as categorized
                     resolved_i = False  # Initialize indicator for loop
 
+                    # Loop over subsequent messages
+                    opposite_side_accepts = 0
+
+                    # Skip to next iteration of loop if we do not expect ME message 
+                    if not (quote.expect_add or quote.expect_amend):
+                        # Testing counter for no reply expected after a quote
+                        quote_testing_counter['quote_reply_not_exp'] += 1
+                        resolved_i = True
+                        continue
+                    
                     # Loop over subsequent messages to assign the event to message i based on outbound messages
                     # of the following Unified Message Types:
-                    # ME: New Order Accept, ME: Order Reject, ME: Partial Fill (P), ME: Partial Fill (A),
-                    # ME: Full Fill (P), ME: Full Fill (A), ME: Order Expire, ME: Order Suspend,
-                    # ME: Other Reject
-                    for j in order_msgs.index[order_msgs.index > i]:
+                    # ME: New Order Accept, ME: Order Reject, 
+                    # ME: Partial Fill (P), ME: Partial Fill (A),
+                    # ME: Full Fill (P), ME: Full Fill (A), 
+                    # ME: Order Expire, ME: Order Suspend,
+                    # ME: Other Reject, 'ME: Cancel/Replace Accept'
+                    for j_pos in range(i_pos + 1, end):
+                        j = quote_index[j_pos]
+                        umt_j = umt[j]
                         
-                        # Skip if message has already been categorized or if it has a different ClientOrderID value.
-                        # Gateway messages with the same ClientOrderID will not trigger any of the if statements in the j loop
-                        if msgs.at[j, 'Categorized'] or msgs.at[j, 'ClientOrderID'] != msgs.at[i, 'ClientOrderID']:
+                        # Skip if message j has already been categorized
+                        if side_categorized[j]:
                             continue
 
-                        # ME New Order Accept
-                        if order_msgs.at[j, 'UnifiedMessageType'] == 'ME: New Order Accept':
-                            order.update_me(q=msgs.at[j, 'LeavesQty'])
-                            msgs.at[i, 'Event'] = 'New order accepted'  # Assign event to message i
-                            msgs.at[j, 'EventNum'] = counter # Populate EventNum
-                            msgs.at[j, 'PriceLvl'] = order.me_prc
-                            msgs.at[j, 'Categorized'] = True  # Flag message j as categorized
+                        # If message j is on the opposite side of the current loop
+                        # (we loop through Bid and Ask separately), we need to 
+                        # decide whether to break, pass, or continue:
+                        #     1. If there have been two accepts on the opposite side 
+                        #        after the new quote inbound, then this means outbound j 
+                        #        is already in the next quote event. The event on the current side
+                        #        must be ended due to serial processing of messages. 
+                        #        Hence we break from the loop.
+                        #     2. Else if message j is a reject, a reject on either side indicates a 
+                        #        reject on both sides. So we let the message go through the event
+                        #        classification code and it will be categorized as a reject event.
+                        #     3. Else, we continue the loop to the next message 
+                        #        because we are doing the classification for two sides separately
+                        #        and message j is on the opposite side. It is not a reject, so it 
+                        #        does not affect the event of the current side of the loop.
+
+                        if msg_side[j] == op_side:
+                            opposite_side_accepts += ((1 << umt_j) & QUOTE_ACCEPT_MASK) > 0
+                            if opposite_side_accepts > 1:
+                                # Testing counter for cases in which 2 op accept messages were seen 
+                                quote_testing_counter['op_side_break'] += 1
+                                break
+                            elif (1 << umt_j) & ORDER_REJECT_MASK:
+                                pass
+                            else:
+                                continue
+
+                        # Break if next ME message has different ClientOrderID
+                        # This assumes that Gateway New Order messages are processed serially in order
+                        # of submission. This assumption should be fine within a UserID.
+                        # Note that we require the MessageType to be Execution_Report, in addition to 
+                        # having a different ClientOrderID to break. The purpose of the additional 
+                        # requirement on MessageType is to let cancels go through this check instead of break.
+                        # With perfect data, this should not bind.
+                        if client_order_id[j] != coid_i:
+                            # if msg_type[j] == MT_EXECUTION_REPORT:
+                            break
+
+                        # ME New Order Accept 
+                        if umt_j == UMT_ME_NEW_ORDER_ACCEPT:
+                            quote.update_me(leaves_qty[j], QS_ACCEPTED)
+                            side_event[i] = EV_NEW_QUOTE_ACCEPTED  # Assign event to message i
+                            side_event_num[j] = counter  # Populate EventNum
+                            side_price_lvl[j] = quote.me_prc
+                            side_categorized[j] = True  # Flag message j as categorized
                             resolved_i = True  # Update indicator
 
-                        # ME Full Fill - (A) for aggressive
-                        elif order_msgs.at[j, 'UnifiedMessageType'] == 'ME: Full Fill (A)':
-                            order.update_me(q=msgs.at[j, 'LeavesQty'])
-                            msgs.at[i, 'Event'] = 'New order aggressively executed in full'  # Assign event to message i
-                            msgs.at[i, 'MinExecPriceLvl'] = msgs.at[j, 'ExecutedPrice']
-                            msgs.at[i, 'MaxExecPriceLvl'] = msgs.at[j, 'ExecutedPrice']
-                            msgs.at[j, 'EventNum'] = counter  # Populate EventNum
-                            msgs.at[j, 'PriceLvl'] = order.me_prc
-                            msgs.at[j, 'Categorized'] = True  # Flag message j as categorized
+                        # ME Cancel/Replace Accept
+                        elif umt_j == UMT_ME_CANCEL_REPLACE_ACCEPT:
+                            quote.update_me(leaves_qty[j], QS_AMENDED)
+                            side_event[i] = EV_NEW_QUOTE_UPDATED  # Assign event to message i
+                            side_event_num[j] = counter  # Populate EventNum
+                            side_prev_price_lvl[j] = quote.cancel_prc
+                            side_prev_qty[i] = quote.cancel_qty
+                            side_price_lvl[j] = quote.me_prc
+                            side_categorized[j] = True  # Flag message j as categorized
                             resolved_i = True  # Update indicator
 
-                        # ME Partial Fill - (A) for aggressive
-                        # Loop over subsequent messages until the order is filled or fails
-                        elif order_msgs.at[j, 'UnifiedMessageType'] == 'ME: Partial Fill (A)':
-                            order.update_me(q=msgs.at[j, 'LeavesQty'])
-                            msgs.at[j, 'EventNum'] = counter  # Populate EventNum
-                            msgs.at[j, 'PriceLvl'] = order.me_prc
-                            msgs.at[j, 'Categorized'] = True  # Flag message as categorized
-                            executed_prices = [msgs.at[j, 'ExecutedPrice']]
-                            resolved_j = False  # Initialize indicator for loop
+                        # ME Full Fill - Passive
+                        # This block allows us to pass over passive fill messages that occur immediately after
+                        # Gateway order submission. Otherwise, we would break the loop on observing a passive fill.
+                        # The point is to simplify the code. Note that we only categorize message j here, i is not categorized.
+                        elif umt_j == UMT_ME_FULL_FILL_PASSIVE:
+                            pcounter += 1
+                            quote.passive_fill(np.nan, QS_EXECUTED_FULL)
+                            side_event[j] = EV_QUOTE_PASSIVELY_EXECUTED_IN_FULL
+                            side_event_num[j] = pcounter
+                            side_price_lvl[j] = quote.me_prc  # Assume fill at prev ME limit price
+                            side_categorized[j] = True
+
+                        # ME Full Fill - Aggressive
+                        elif umt_j == UMT_ME_FULL_FILL_AGGR:
+                            quote.update_me(leaves_qty[j], QS_EXECUTED_FULL)
+                            side_event[i] = EV_NEW_QUOTE_AGGRESSIVELY_EXECUTED_IN_FULL  # Assign event to message i
+                            side_min_exec_price_lvl[i] = executed_price[j]
+                            side_max_exec_price_lvl[i] = executed_price[j]
+                            side_event_num[j] = counter  # Populate EventNum
+                            side_price_lvl[j] = quote.me_prc
+                            side_categorized[j] = True  # Flag message j as categorized
+                            resolved_i = True  # Update indicator
 
-                            for k in order_msgs.index[order_msgs.index > j]:
+                        # ME Partial Fill - Passive
+                        # This block allows us to pass over passive fill messages that occur immediately after
+                        # Gateway order submission. Otherwise, we break the loop on observing a passive fill.
+                        # The point is to simplify the code. Note that we only categorize message j here, i is not categorized.
+                        elif umt_j == UMT_ME_PARTIAL_FILL_PASSIVE:
+                            pcounter += 1
+                            quote.passive_fill(leaves_qty[j], QS_EXECUTED_PART)
+                            side_event[j] = EV_QUOTE_PASSIVELY_EXECUTED_IN_PART
+                            side_event_num[j] = pcounter
+                            side_price_lvl[j] = quote.me_prc  # Assume fill at prev ME limit price
+                            side_categorized[j] = True
+
+                        # ME Partial Fill - A is Aggressive
+                        elif umt_j == UMT_ME_PARTIAL_FILL_AGGR:
+                            quote.update_me(leaves_qty[j], QS_EXECUTED_PART)
+                            min_exec_price = max_exec_price = executed_price[j]
+                            side_event[i] = EV_NEW_QUOTE_AGGRESSIVELY_EXECUTED_IN_PART
+                            side_event_num[j] = counter  # Populate EventNum
+                            side_price_lvl[j] = quote.gw_prc
+                            side_categorized[j] = True  # Flag message j as categorized
+                            resolved_j = False  # Initialize indicator for loop
 
-                                # Skip if message has already been categorized or ClientOrderID doesn't match
-                                # or message has different ClientOrderID value
-                                if msgs.at[k, 'Categorized'] or msgs.at[k, 'ClientOrderID'] != msgs.at[i, 'ClientOrderID']:
+                            # Loop over subsequent messages
+                            # This loop either completes the event on the aggressive partial fill or 
+                            # checks remaining messages for additional partial fills or full fills
+                            for k_pos in range(j_pos + 1, end):
+                                k = quote_index[k_pos]
+                                umt_k = umt[k]
+
+                                # Skip if message has already been categorized
+                                if side_categorized[k]:
                                     continue
+                                # For messages on the opposite side (see previous comments)
+                                if msg_side[k] == op_side:
+                                    opposite_side_accepts += ((1 << umt_k) & QUOTE_ACCEPT_MASK) > 0
+                                    if opposite_side_accepts > 1:
+                                        quote_testing_counter['op_side_break'] += 1
+                                        break
+                                    elif (1 << umt_k) & ORDER_REJECT_MASK:
+                                        pass
+                                    else:
+                                        continue
+                                # Break if next ME message has different ClientOrderID
+                                # See previous comments for details. 
+                                if client_order_id[k] != coid_i:
+                                    # if msg_type[k] == MT_EXECUTION_REPORT:
+                                    break
 
-                                # ME Full Fill - (A) for aggressive
-                                if order_msgs.at[k, 'UnifiedMessageType'] == 'ME: Full Fill (A)':
-                                    order.update_me(q=msgs.at[k, 'LeavesQty'])
-                                    executed_prices = executed_prices + [msgs.at[k, 'ExecutedPrice']]
-                                    msgs.at[i, 'Event'] = 'New order aggressively executed in full'  # Assign event to message i
-                                    msgs.at[i, 'MinExecPriceLvl'] = min(executed_prices)
-                                    msgs.at[i, 'MaxExecPriceLvl'] = max(executed_prices)
-                                    msgs.at[k, 'EventNum'] = counter  # Populate EventNum
-                                    msgs.at[k, 'PriceLvl'] = order.me_prc
-                                    msgs.at[k, 'Categorized'] = True  # Flag message k as categorized
-                                    resolved_j, resolved_i = True, True  # Update indicators
-
-                                # ME Partial Fill - (A) for aggressive
-                                elif order_msgs.at[k, 'UnifiedMessageType'] == 'ME: Partial Fill (A)':
-                                    order.update_me(q=msgs.at[k, 'LeavesQty'])
-                                    executed_prices = executed_prices + [msgs.at[k, 'ExecutedPrice']]
-                                    msgs.at[k, 'EventNum'] = counter  # Populate
-                                    msgs.at[k, 'PriceLvl'] = order.me_prc
-                                    msgs.at[k, 'Categorized'] = True  # Flag message k as categorized
-                                    resolved_j, resolved_i = False, False  # Do not update indicators
-
-                                # ME Order Expire for IOC messages that immediately cancelled the order 
-                                elif order_msgs.at[k, 'UnifiedMessageType'] == 'ME: Order Expire' and order_msgs.at[i, 'UnifiedMessageType'] == 'Gateway New Order (IOC)':
-                                    order.update_me(q=np.nan)
-                                    msgs.at[i, 'Event'] = 'New order aggressively executed in part'  # Assign event to message i
-                                    msgs.at[i, 'MinExecPriceLvl'] = min(executed_prices)
-                                    msgs.at[i, 'MaxExecPriceLvl'] = max(executed_prices)
-                                    msgs.at[k, 'EventNum'] = counter  # Populate EventNum
-                                    msgs.at[k, 'PriceLvl'] = order.me_prc
-                                    msgs.at[k, 'Categorized'] = True  # Flag message k as categorized
-                                    resolved_j, resolved_i = True, True  # Update indicators
-                                
-                                # ME New Order Accept after partial fills 
-                                # If the Matching Engine sends a post-to-book confirmation after an 
-                                # aggressive order is executed in part (the rest is posted to book),
-                                # then the loop will end up in this case. For example,
-                                # In the LSE data, since there is NO post-to-book confirmation after 
-                                # an aggressive order is executed in part, this case is not captured here. 
-                                # It is captured two blocks below in the No further ME Response
-                                # after partial fills case.
-                                elif order_msgs.at[k, 'UnifiedMessageType'] == 'ME: New Order Accept':
-                                    order.update_me(q=msgs.at[k, 'LeavesQty'])
-                                    executed_prices = executed_prices + [msgs.at[k, 'ExecutedPrice']]
-                                    msgs.at[i, 'Event'] = 'New order aggressively executed in full'  # Assign event to message i
-                                    msgs.at[i, 'MinExecPriceLvl'] = min(executed_prices)
-                                    msgs.at[i, 'MaxExecPriceLvl'] = max(executed_prices)
-                                    msgs.at[k, 'EventNum'] = counter  # Populate EventNum
-                                    msgs.at[k, 'PriceLvl'] = order.me_prc
-                                    msgs.at[k, 'Categorized'] = True  # Flag message k as categorized
+                                # ME Full Fill
+                                if umt_k == UMT_ME_FULL_FILL_AGGR:
+                                    quote.update_me(leaves_qty[k], QS_EXECUTED_FULL)
+                                    min_exec_price, max_exec_price = min(min_exec_price, executed_price[k]), max(max_exec_price, executed_price[k])
+                                    side_event[i] = EV_NEW_QUOTE_AGGRESSIVELY_EXECUTED_IN_FULL  # Assign event to message i
+                                    side_event_num[k] = counter # Populate EventNum
+                                    side_price_lvl[k] = quote.gw_prc
+                                    side_categorized[k] = True # Flag message k as categorized
                                     resolved_j, resolved_i = True, True  # Update indicators
 
-                                # Other ME Message 
-                                # When observing other ME messages following the passive fills, 
-                                # the current event at least one passive fill is ended.
-                                # This case includes, for instance, a new order aggressively executed in part
-                                # and then the remaining part rests in the book and after that, it is executed
-                                # passively. These passive fills end the current event and will be classified
-                                # into other events.
-                                elif order_msgs.at[k, 'MessageType'] == 'Execution_Report':
-                                    msgs.at[i, 'Event'] = 'New order aggressively executed in part'  # Assign event to message i
-                                    msgs.at[i, 'MinExecPriceLvl'] = min(executed_prices)
-                                    msgs.at[i, 'MaxExecPriceLvl'] = max(executed_prices)
-                                    resolved_j, resolved_i = True, True  # Update indicators
-                                    order_testing_counter['partial_other_me'] += 1 # test counter
+                                # ME Partial Fill
+                                elif umt_k == UMT_ME_PARTIAL_FILL_AGGR:
+                                    quote.update_me(leaves_qty[k], QS_EXECUTED_PART)
+                                    min_exec_price, max_exec_price = min(min_exec_price, executed_price[k]), max(max_exec_price, executed_price[k])
+                                    side_event_num[k] = counter  # Populate EventNum
+                                    side_price_lvl[k] = quote.gw_prc
+                                    side_categorized[k] = True  # Flag message k as categorized
 
+                                # Other ME Message
+                                # e.g. Cancel accept and passive fill messages would fall into this category
+                                elif msg_type[k] == MT_EXECUTION_REPORT:
+                                    quote_testing_counter['partial_other_me'] += 1 # Testing counter
+                                    if (1 << umt_k) & PASSIVE_FILL_MASK:
+                                        quote_testing_counter['partial_me_passive'] += 1 # Testing counter
+                                    elif umt_k == UMT_ME_CANCEL_ACCEPT:
+                                        quote_testing_counter['partial_me_cancel'] += 1 # Testing counter
+                                    break
+                                    
                                 if resolved_j:
                                     break
 
-                            # No further ME Response after partial fills
-                            # In cases where there are no further outbound messages after the partial fill
-                            # This could be that an order is executed aggressively in part
-                            # and then stays in the order book for the rest of the day, or packet loss. 
-                            # Since an aggressive partial fill message is already observed, the event is  
-                            # categorized as aggressive partial fill.
-                            # For instance, in the LSE data, after the new order is aggressively executed in part, 
-                            # the rest of the order will be posted to book but there will NOT be a post to book message.
-                            # Hence if we see no further ME response after partial fills, we assume they will be
-                            # posted to book. If the data has this post-to-book message after partial fills, 
-                            # the same code logic still applies, except that we will end up observing 
-                            # ME New Order Accept after partial fills (two blocks above) since we will see 
-                            # a post-to-book confirmation after partial execution. 
-                            if not resolved_j:
-                                msgs.at[i, 'Event'] = 'New order aggressively executed in part'  # Assign event to message i
-                                msgs.at[i, 'MinExecPriceLvl'] = min(executed_prices)
-                                msgs.at[i, 'MaxExecPriceLvl'] = max(executed_prices)
-                                order_testing_counter['pf_no_further_reply'] += 1 # test counter
-                                resolved_i = True  # Update indicator
+                            # Range of prices at which the quote executed aggressively.
+                            # Recorded once the fills of the event have been collected.
+                            side_min_exec_price_lvl[i] = min_exec_price
+                            side_max_exec_price_lvl[i] = max_exec_price
 
-                        # ME Order Expire
-                        elif order_msgs.at[j, 'UnifiedMessageType'] == 'ME: Order Expire':
-                            order.update_me(q=np.nan)
-                            msgs.at[i, 'Event'] = 'New order expired'  # Assign event to message i
-                            msgs.at[j, 'EventNum'] = counter  # Populate EventNum
-                            msgs.at[j, 'PriceLvl'] = order.me_prc
-                            msgs.at[j, 'Categorized'] = True  # Flag message j as categorized
+                            # No further ME Response
+                            # No further ME response after an aggressive partial fill.
+                            # e.g. the quote traded aggressively in part and the rest is post to book.
+                            # In LSE, the matching engine will not send a post-to-book confirmation in this case.
+                            if not resolved_j:
+                                quote_testing_counter['pf_no_further_reply'] += 1
+                                resolved_i = True
+
+                        # ME Order Reject 
+                        # If there is a reject on either side, the entire quote is rejected
+                        elif (1 << umt_j) & ORDER_REJECT_MASK:
+                            quote.update_me(np.nan, QS_REJECTED)
+                            side_event[i] = EV_NEW_QUOTE_FAILED  # Assign event to message i
+                            side_event_num[j] = counter  # Populate EventNum
+                            side_price_lvl[j] = quote.gw_prc
+                            side_categorized[j] = True  # Flag message j as categorized
                             resolved_i = True  # Update indicator
 
-                        # ME Order Reject
-                        elif order_msgs.at[j, 'UnifiedMessageType'] in ('ME: Order Reject', 'ME: Other Reject'):
-                            order.update_me(q=np.nan)
-                            msgs.at[i, 'Event'] = 'New order failed'  # Assign event to message i
-                            msgs.at[j, 'EventNum'] = counter  # Populate EventNum
-                            msgs.at[j, 'PriceLvl'] = order.me_prc
-                            msgs.at[j, 'Categorized'] = True  # Flag message j as categorized
+                        # ME Order Expire
+                        elif umt_j == UMT_ME_ORDER_EXPIRE:
+                            quote.update_me(np.nan, QS_EXPIRED)
+                            side_event[i] = EV_NEW_QUOTE_EXPIRED  # Assign event to message i
+                            side_event_num[j] = counter  # Populate EventNum
+                            side_price_lvl[j] = quote.gw_prc
+                            side_categorized[j] = True  # Flag message j as categorized
                             resolved_i = True  # Update indicator
 
                         # ME Order Suspend
-                        elif order_msgs.at[j, 'UnifiedMessageType'] == 'ME: Order Suspend':
-                            order.update_me(q=msgs.at[j, 'LeavesQty'])
-                            msgs.at[i, 'Event'] = 'New order suspended'  # Assign event to message i
-                            msgs.at[j, 'EventNum'] = counter  # Populate EventNum
-                            msgs.at[j, 'PriceLvl'] = order.me_prc
-                            msgs.at[j, 'Categorized'] = True  # Flag message j as categorized
+                        elif umt_j == UMT_ME_ORDER_SUSPEND:
+                            quote.update_me(leaves_qty[j], QS_SUSPENDED)
+                            side_event[i] = EV_NEW_QUOTE_SUSPENDED  # Assign event to message i
+                            side_event_num[j] = counter  # Populate EventNum
+                            side_price_lvl[j] = quote.me_prc
+                            side_categorized[j] = True  # Flag message j as categorized
                             resolved_i = True  # Update indicator
-                        
-                        else:
-                            # counter if other ME message after new order inbound
-                            order_testing_counter['nocr_other_me'] += 1 
 
-                        if resolved_i:
+                        # Other ME Message
+                        # e.g. Cancel accept messages would fall into this category 
+                        # This should not happen with perfect data since there shouldn't be
+                        # a cancel accept following a New_Quote message
+                        elif msg_type[j] == MT_EXECUTION_REPORT:
+                            quote_testing_counter['nqt_other_me'] += 1
+                            if umt_j == UMT_ME_CANCEL_ACCEPT:
+                                quote_testing_counter['nqt_me_cancel'] += 1
                             break
+                        
+                        if resolved_i:
+                            break                        
 
-                    # No ME Response (corner cases)
-                    # The inbound message has no Accept, Fill, Expire, Reject or Suspend outbound message 
+                    # No ME Response
+                    # In new orders this category would parallel "New order no response"
                     if not resolved_i:
-                        # Counter for new order no response
-                        order_testing_counter['no_no_reply'] += 1
-                        msgs.at[i, 'Event'] = 'New order no response'  # Assign event to message i
-                        resolved_i = True  # Update indicator
-
+                        # testing counter for cases in which 2 op messages were seen 
+                        quote_testing_counter['expected_never_arrived'] += 1
+                        side_event[i] = EV_NEW_QUOTE_NO_RESPONSE  # Assign event to message i
+                        quote.no_me_response()
+
+                    # Update counter
+                    # pcounter was incremented by passive events. This ensures we do not 
+                    # have the same event numbers for passive and aggressive events
+                    counter = pcounter
+                    
                 # Gateway Cancel
-                # This includes the following Type:  'Gateway Cancel'
+                # This includes the following Unified Message Types: 'Gateway Quote Cancel'
                 # and classifies message i in the following Events:
-                # 'Cancel request accepted', 'Cancel request rejected', 'Cancel request failed', 'Cancel request no response'
-                # The difference between cancel request rejected and failed is that:
-                #     - Cancel request rejected: If a ME: Cancel Reject (TLTC) outbound is observed.
-                #                                This is the failed cancel cases we use in the race detection section.
-                #     - Cancel request failed: If the cancel request is rejected by other reasons,
-                #                              that is, 'ME: Cancel Reject (Other)' or 'ME: Other Reject'.
-                #                              This does NOT count as failed cancels we define in the race detection section
-                elif order_msgs.at[i, 'MessageType'] == 'Cancel_Request':
-                    counter += 1  # Increment event counter
-                    msgs.at[i, 'EventNum'] = counter  # Populate EventNum
-                    msgs.at[i, 'PrevPriceLvl'] = order.gw_prc  # Assume cancel affects last submitted GW message
-                    msgs.at[i, 'Categorized'] = True  # Flag message i as categorized
+                # 'Quote cancel accepted', 'Quote cancel failed', 'Quote cancel rejected', 
+                # 'Quote cancel no response'
+                elif msg_type[i] == MT_CANCEL_REQUEST:
+                    counter += 1  # Increment event counter 
+                    quote.update_expectations()
+                    side_event_num[i] = counter  # Populate EventNum
+                    side_prev_price_lvl[i] = quote.gw_prc  # Assume cancel occurs at price level of last
+                    side_categorized[i] = True  # Flag message i as categorized
                     resolved_i = False  # Initialize indicator for loop
+                    
+                    # Break if expect cancel is false
+                    if quote.expect_cancel == False:
+                        # testing counter for no reply expected after a quote
+                        quote_testing_counter['quote_reply_not_exp'] += 1
+                        resolved_i = True
+                        continue
 
                     # Loop over subsequent messages to assign the event to message i based on outbound messages
                     # of the following Unified Message Types:
-                    # 'ME: Cancel Accept', 'ME: Cancel Reject (TLTC)',
-                    # 'ME: Cancel Reject (Other)', 'ME: Other Reject'
-                    for j in order_msgs.index[order_msgs.index > i]:
-
-                        # Skip if message has already been categorized or if it has a different ClientOrderID value.
-                        # Gateway messages with the same ClientOrderID will not trigger any of the if statements in the j loop.
-                        if msgs.at[j, 'Categorized'] or msgs.at[j, 'ClientOrderID'] != msgs.at[i, 'ClientOrderID']:
+                    # 'ME: Order Reject', 'ME: Protocol Reject', 'ME: Business Reject', 'ME: Cancel Accept',
+                    # 'ME: Cancel Reject (TLTC)', 'ME: Cancel Reject (Other)'
+                    for j_pos in range(i_pos + 1, end):
+                        j = quote_index[j_pos]
+                        umt_j = umt[j]
+                        
+                        # Continue to the next message and skip j if 
+                        # message j has already been categorized. 
+                        if side_categorized[j]:
                             continue
 
+                        # If message j is on the opposite side of the loop:
+                        # If message j is a cancel reject, then let message j go through 
+                        # the event classification code below. Since a reject will have
+                        # an effect on both sides.
+                        # Else if message 
+                        # we see a new order accept on the opposite side.
+                        # Else, continue the loop: skip message j and go to the next one
+                        # since j is on the opposite side and has no effect on the current 
+                        # side of the loop.
+                        if msg_side[j] == op_side:
+                            if (1 << umt_j) & CANCEL_REJECT_MASK:
+                                pass
+                            elif (1 << umt_j) & QUOTE_ACCEPT_MASK:
+                                quote_testing_counter['op_side_break'] += 1
+                                break
+                            else:
+                                continue
+                        
+                        if client_order_id[j] != coid_i:
+                            # if msg_type[j] == MT_EXECUTION_REPORT:
+                            break
+
+                        # Break on next ME: New Order Accept 
+                        # Because this means we enter the next event of the current side of the loop
+                        if umt_j == UMT_ME_NEW_ORDER_ACCEPT:
+                            break
+
                         # ME Cancel Accept
-                        if order_msgs.at[j, 'UnifiedMessageType'] == 'ME: Cancel Accept':
-                            order.cancel()
-                            msgs.at[i, 'Event'] = 'Cancel request accepted'  # Assign event to message
-                            msgs.at[j, 'EventNum'] = counter  # Populate EventNum
-                            msgs.at[j, 'PrevPriceLvl'] = order.cancel_prc
-                            msgs.at[i, 'PrevQty'] = order.cancel_qty
-                            msgs.at[j, 'Categorized'] = True  # Flag message j as categorized
+                        if umt_j == UMT_ME_CANCEL_ACCEPT:
+                            quote.cancel()
+                            side_event[i] = EV_QUOTE_CANCEL_ACCEPTED  # Assign event to message i
+                            side_event_num[j] = counter  # Populate EventNum
+                            side_prev_price_lvl[j] = quote.cancel_prc
+                            side_prev_qty[i] = quote.cancel_qty
+                            side_categorized[j] = True  # Flag message j as categorized
                             resolved_i = True  # Update indicator
 
-                        # ME Cancel Reject (TLTC)
-                        if order_msgs.at[j, 'UnifiedMessageType'] == 'ME: Cancel Reject (TLTC)':
-                            order.cancel_reject()
-                            msgs.at[i, 'Event'] = 'Cancel request rejected'  # Assign event to message
-                            msgs.at[j, 'EventNum'] = counter  # Populate EventNum
-                            msgs.at[j, 'PrevPriceLvl'] = order.cancel_prc
-                            msgs.at[i, 'PrevQty'] = order.cancel_qty
-                            msgs.at[j, 'Categorized'] = True  # Flag message j as categorized
+                        # ME Cancel Reject (TLTC = To Late to Cancel)
+                        # This is the event used for failed cancels in the race detection
+                        elif umt_j == UMT_ME_CANCEL_REJECT_TLTC:
+                            quote.cancel_reject()
+                            side_event[i] = EV_QUOTE_CANCEL_REJECTED  # Assign event to message i
+                            side_event_num[j] = counter  # Populate EventNum
+                            side_prev_price_lvl[j] = quote.cancel_prc
+                            side_prev_qty[i] = quote.cancel_qty
+                            side_categorized[j] = True  # Flag message j as categorized
                             resolved_i = True  # Update indicator
 
-                        # ME Other Cancel Reject
-                        if order_msgs.at[j, 'UnifiedMessageType'] in ('ME: Cancel Reject (Other)', 'ME: Other Reject'):
-                            order.cancel_reject()
-                            msgs.at[i, 'Event'] = 'Cancel request failed'  # Assign event to message
-                            msgs.at[j, 'EventNum'] = counter  # Populate EventNum
-                            msgs.at[j, 'PrevPriceLvl'] = order.cancel_prc
-                            msgs.at[i, 'PrevQty'] = order.cancel_qty
-                            msgs.at[j, 'Categorized'] = True  # Flag message j as categorized
+                        # ME Cancel Reject 
+                        # If there is a reject on either side, the entire quote is rejected
+                        elif umt_j == UMT_ME_CANCEL_REJECT_OTHER:
+                            quote.cancel_reject()
+                            side_event[i] = EV_QUOTE_CANCEL_FAILED  # Assign event to message i
+                            side_event_num[j] = counter  # Populate EventNum
+                            side_prev_price_lvl[j] = quote.cancel_prc
+                            side_prev_qty[i] = quote.cancel_qty
+                            side_categorized[j] = True  # Flag message j as categorized
                             resolved_i = True  # Update indicator
 
-                        # Break loop if message resolves the event
+                        # Testing counter for other outbound messages
+                        elif msg_type[j] == MT_EXECUTION_REPORT and msg_side[j] == side_code:
+                            quote_testing_counter['cancel_other_me'] += 1 # testing counter
+                        
                         if resolved_i:
                             break
-                        else:
-                            # Counter for other ME activity after cancel inbound
-                            order_testing_counter['cancel_other_me'] += 1
 
-                    # Classify unresolved events as no response
+                    # No ME Response
                     if not resolved_i:
-                        order_testing_counter['cancel_no_reply'] += 1 # cancel message but no ME response
-                        msgs.at[i, 'Event'] = 'Cancel no response'  # Assign event to message i
-                        resolved_i = True  # Update indicator
+                        side_event[i] = EV_QUOTE_CANCEL_NO_RESPONSE  # Assign event to message i
+                        quote.no_me_response()
+                        quote_testing_counter['cancel_no_reply'] += 1 # testing counter
+
+            # Execution Report - passive, other fills and reject cases for outbounds
+            # These messages refer to passive fills and to outbound messages
+            # with missing inbound messages (packet loss)
+            # This includes the following Type: 'ME: Partial Fill (P)', 'ME: Full Fill (P)', 'ME: Partial Fill (Other)',
+            # 'ME: Full Fill (Other)', 'ME: Cancel Accept', 'ME: Cancel/Replace Accept', 'ME: Order Reject', 'ME: Order Suspend'
+            # 'ME: New Order Accept', 'ME: Order Expire'
+            # and classifies message i in the following Events:
+            # 'Quote passively executed in part', 'Quote passively executed in full', 
+            # 'Quote executed in part (other), 'Quote executed in full (other), 'Other ME activity'
+                elif msg_type[i] == MT_EXECUTION_REPORT and msg_side[i] == side_code:
 
-                # Gateway Cancel/Replace
-                # This includes the following Type:  'Gateway Cancel/Replace'
-                # and classifies message i in the following Events:
-                # 'Cancel/replace request aggr executed in full', 'Cancel/replace request rejected', 
-                # 'Cancel/replace request failed', 'Cancel/replace request no response'
-                # The difference between cancel/replace request rejected and failed is similar to 
-                # that of cancel request rejected and failed. 
-                # Only Cancel/replace request rejected is counted as failed cancels in race detection.
-                elif order_msgs.at[i, 'MessageType'] == 'Cancel_Replace_Request':
                     counter += 1  # Increment event counter
-                    order.amend(p=msgs.at[i, 'LimitPrice'], q=msgs.at[i, 'OrderQty'])
-                    msgs.at[i, 'EventNum'] = counter  # Populate EventNum
-                    msgs.at[i, 'PrevPriceLvl'] = order.cancel_prc
-                    msgs.at[i, 'PriceLvl'] = order.gw_prc
-                    msgs.at[i, 'Categorized'] = True  # Flag message i as categorized
-                    resolved_i = False  # Initialize indicator for loop
 
-                    # Loop over subsequent messages
-                    for j in order_msgs.index[order_msgs.index > i]:
-
-                        # Skip if message j has already been categorized
-                        # or message j has different ClientOrderID value than message i
-                        if msgs.at[j, 'Categorized'] or msgs.at[j, 'ClientOrderID'] != msgs.at[i, 'ClientOrderID']:
-                            continue
-
-                        # ME Cancel/Replace Accept
-                        if order_msgs.at[j, 'UnifiedMessageType'] == 'ME: Cancel/Replace Accept':
-                            order.update_me(q=msgs.at[j, 'LeavesQty'])
-                            msgs.at[j, 'EventNum'] = counter  # Populate EventNum
-                            msgs.at[j, 'PrevPriceLvl'] = order.cancel_prc
-                            msgs.at[i, 'PrevQty'] = order.cancel_qty
-                            msgs.at[j, 'PriceLvl'] = order.me_prc
-                            msgs.at[j, 'Categorized'] = True  # Flag message j as categorized
-                            resolved_j = False  # Initialize indicators for loop
-
-                            # Loop over subsequent messages
-                            for k in order_msgs.index[order_msgs.index > j]:
-
-                                # Skip if message is not an uncategorized response
-                                # or message k has different ClientOrderID value than message i
-                                if msgs.at[k, 'Categorized'] or msgs.at[k, 'ClientOrderID'] != msgs.at[i, 'ClientOrderID']:
-                                    continue
-
-                                # ME Full Fill - (A) for aggressive
-                                if order_msgs.at[k, 'UnifiedMessageType'] == 'ME: Full Fill (A)':
-                                    order.update_me(q=msgs.at[k, 'LeavesQty'])
-                                    msgs.at[i, 'Event'] = 'Cancel/replace request aggr executed in full'  # Assign event to message i
-                                    msgs.at[i, 'MinExecPriceLvl'] = msgs.at[j, 'ExecutedPrice']
-                                    msgs.at[i, 'MaxExecPriceLvl'] = msgs.at[j, 'ExecutedPrice']
-                                    msgs.at[k, 'EventNum'] = counter  # Populate EventNum
-                                    msgs.at[k, 'PriceLvl'] = order.me_prc
-                                    msgs.at[k, 'Categorized'] = True # Flag message k as categorized
-                                    resolved_j, resolved_i = True, True  # Update indicators
-
-                                # ME Partial Fill - (A) for aggressive
-                                elif order_msgs.at[k, 'UnifiedMessageType'] == 'ME: Partial Fill (A)':
-                                    order.update_me(q=msgs.at[k, 'LeavesQty'])
-                                    executed_prices = [msgs.at[k, 'ExecutedPrice']]
-                                    msgs.at[k, 'EventNum'] = counter  # Populate EventNum
-                                    msgs.at[k, 'PriceLvl'] = order.me_prc
-                                    msgs.at[k, 'Categorized'] = True  # Flag message k as categorized
-                                    resolved_k = False  # Initialize indicator for loop
-
-                                    # Loop over subsequent messages
-                                    for l in order_msgs.index[order_msgs.index > k]:
-
-                                        # Skip if message l is not an uncategorized response
-                                        # message l has different ClientOrderID value than message i
-                                        if msgs.at[l, 'Categorized'] or msgs.at[l, 'ClientOrderID'] != msgs.at[i, 'ClientOrderID']:
-                                            continue
-
-                                        # ME Full Fill - (A) for aggressive
-                                        if order_msgs.at[l, 'UnifiedMessageType'] == 'ME: Full Fill (A)':
-                                            order.update_me(q=msgs.at[l, 'LeavesQty'])
-                                            executed_prices = executed_prices + [msgs.at[l, 'ExecutedPrice']]
-                                            msgs.at[i, 'Event'] = 'Cancel/replace request aggr executed in full'  # Assign event to message i
-                                            msgs.at[i, 'MinExecPriceLvl'] = min(executed_prices)
-                                            msgs.at[i, 'MaxExecPriceLvl'] = max(executed_prices)
-                                            msgs.at[l, 'EventNum'] = counter # Populate EventNum
-                                            msgs.at[l, 'PriceLvl'] = order.me_prc
-                                            msgs.at[l, 'Categorized'] = True  # Flag message l as categorized
-                                            resolved_k, resolved_j, resolved_i = True, True, True  # Update indicators
-
-                                        # ME Partial Fill - (A) for aggressive
-                                        elif order_msgs.at[l, 'UnifiedMessageType'] == 'ME: Partial Fill (A)':
-                                            order.update_me(q=msgs.at[l, 'LeavesQty'])
-                                            executed_prices = executed_prices + [msgs.at[l, 'ExecutedPrice']]
-                                            msgs.at[i, 'Event'] = '' # Do not assign event to message i 
-                                            msgs.at[l, 'EventNum'] = counter  # Populate EventNum
-                                            msgs.at[l, 'PriceLvl'] = order.me_prc
-                                            msgs.at[l, 'Categorized'] = True  # Flag message l as categorized
-                                            resolved_k, resolved_j, resolved_i = False, False, False  # Do not update indicators
-                                            
-
-                                        # Other ME Message 
-                                        # This includes any Execution Report for an inbound message that relates to a different Event.
-                                        # These messages mark the end of the current event.
-                                        # No EventNum assigned to k as in this case the message is related to a different Event
-                                        # e.g. passive fills after some aggressive partial fills (the order executed aggressively
-                                        # in part and then traded passively after resting in the book for a while).
-                                        elif order_msgs.at[l, 'MessageType'] == 'Execution_Report':
-                                            msgs.at[i, 'Event'] = 'Cancel/replace request aggr executed in part'  # Assign event to message i
-                                            msgs.at[i, 'MinExecPriceLvl'] = min(executed_prices)
-                                            msgs.at[i, 'MaxExecPriceLvl'] = max(executed_prices)
-                                            resolved_k, resolved_j, resolved_i = True, True, True  # Update indicators
-                                            order_testing_counter['partial_other_me'] += 1
-                                            
-                                        if resolved_k:
-                                            break
-
-                                    # No further ME Response
-                                    # No further response, but an aggressive partial fill is already observed
-                                    # e.g. aggressively executed in part then posted to book and wait for 
-                                    # passive execution. Note that no post-to-book message will be generated 
-                                    # by the LSE matching engine in this case.
-                                    if not resolved_k:
-                                        msgs.at[i, 'Event'] = 'Cancel/replace request aggr executed in part'  # Assign event to message i
-                                        msgs.at[i, 'MinExecPriceLvl'] = min(executed_prices)
-                                        msgs.at[i, 'MaxExecPriceLvl'] = max(executed_prices)
-                                        resolved_k, resolved_j, resolved_i = True, True, True  # Update indicators\
-
-                                if resolved_i:
-                                    break
-
-                                # Other ME Message
-                                # This includes any Execution Report for an inbound message that relates to a different Event.
-                                # These messages mark the end of the current event.
-                                # Since the cancel/replace accept message is already observed, the event is C/R accepted.
-                                # NOTE: In principle C/R accept may trigger a suspend (if the stop price is affected), 
-                                # expire (such as by SEP - Self Execution Prevention, client can set to prevent execution between 
-                                # her own orders), or reject, that is, the order is suspended after being accepted.
-                                # The code will treat the ME message in such cases (e.g. suspend, expire, etc. after the C/R accept)
-                                # as part of an 'Other ME activity' and the current event is still C/R accepted.
-                                elif order_msgs.at[k, 'MessageType'] == 'Execution_Report':
-                                    msgs.at[i, 'Event'] = 'Cancel/replace request accepted'  # Assign event to message i
-                                    resolved_j, resolved_i = True, True  # Update indicators
-
-                                if resolved_j:
-                                    break
-
-                            # No ME Response
-                            if not resolved_j:
-                                msgs.at[i, 'Event'] = 'Cancel/replace request accepted'  # Assign event to message i
-                                resolved_i = True  # Update indicator
-
-                        # ME Cancel Reject
-                        elif order_msgs.at[j, 'UnifiedMessageType'] == 'ME: Cancel Reject (TLTC)':
-                            msgs.at[i, 'Event'] = 'Cancel/replace request rejected'
-                            msgs.at[j, 'EventNum'] = counter  # Populate EventNum
-                            msgs.at[j, 'PrevPriceLvl'] = order.cancel_prc
-                            msgs.at[i, 'PrevQty'] = order.cancel_qty
-                            msgs.at[j, 'PriceLvl'] = order.me_prc
-                            msgs.at[j, 'Categorized'] = True  # Flag message j as categorized
-                            resolved_i = True
-
-                        # ME Other Reject
-                        elif order_msgs.at[j, 'UnifiedMessageType'] in ('ME: Cancel Reject (Other)', 'ME: Other Reject'):
-                            msgs.at[i, 'Event'] = 'Cancel/replace request failed'
-                            msgs.at[j, 'PrevPriceLvl'] = order.cancel_prc
-                            msgs.at[i, 'PrevQty'] = order.cancel_qty
-                            msgs.at[j, 'PriceLvl'] = order.me_prc
-                            msgs.at[j, 'Categorized'] = True  # Flag message j as categorized
-                            resolved_i = True
-                            
-                        else:
-                            # other ME message after CR inbound
-                            order_testing_counter['nocr_other_me'] += 1
-
-                        if resolved_i:
-                            break
-
-                    # No ME Response (corner case) 
-                    # No related outbound message for the C/R inbound
-                    if not resolved_i:
-                        # Counter for no reply after cancel replace inbound
-                        order_testing_counter['cr_no_reply'] += 1
-                        msgs.at[i, 'Event'] = 'Cancel/replace no response'  # Assign event to message i
-                        resolved_i = True  # Update indicator
-
-                # Gateway Other Inbound
-                # This includes the following Type: 'Other_Inbound'
-                # and classifies message i in  the following Events:
-                # 'Other Gateway activity'
-                elif order_msgs.at[i, 'MessageType'] == 'Other_Inbound':
-                    counter += 1
-                    msgs.at[i, 'Event'] = 'Other Gateway activity'
-                    msgs.at[i, 'EventNum'] = counter
-                    msgs.at[i, 'Categorized'] = True
-                
-                # Execution Report
-                # Passive, other fills and reject cases for outbounds
-                # These messages refer to orders passively executed and 
-                # to outbound messages with missing inbound messages (packet loss)
-                # This includes the following Type: 
-                # 'ME: Partial Fill (P)', 'ME: Full Fill (P)', 
-                # 'ME: Partial Fill (Other)', 'ME: Full Fill (Other)', 
-                # 'ME: Cancel Accept', 'ME: Cancel/Replace Accept', 
-                # and classifies message i in the following Events:
-                # 'Other ME activity', 
-                # 'Order passively executed in part', 'Order passively executed in full', 
-                # 'Order executed in part (other)', 'Order executed in full (other)'
-                elif order_msgs.at[i, 'MessageType'] == 'Execution_Report':
-
-                    counter += 1  # Increment event counter
-
-                    # Partial passive execution - (P) for Passive 
-                    if order_msgs.at[i, 'UnifiedMessageType'] == 'ME: Partial Fill (P)':
-                        order.passive_fill(leaves=msgs.at[i, 'LeavesQty'])
-                        msgs.at[i, 'Event'] = 'Order passively executed in part'  # Assign event to message i
-                        msgs.at[i, 'EventNum'] = counter  # Populate EventNum for message i
-                        msgs.at[i, 'PriceLvl'] = order.me_prc
-                        msgs.at[i, 'Categorized'] = True  # Flag message i as categorized
-
-                    # Full passive execution - (P) for Passive 
-                    elif order_msgs.at[i, 'UnifiedMessageType'] == 'ME: Full Fill (P)':
-                        order.passive_fill(leaves=np.nan)
-                        msgs.at[i, 'Event'] = 'Order passively executed in full'  # Assign event to message i
-                        msgs.at[i, 'EventNum'] = counter  # Populate EventNum for message i
-                        msgs.at[i, 'PriceLvl'] = order.me_prc
-                        msgs.at[i, 'Categorized'] = True  # Flag message i as categorized
+                    # Partial passive execution
+                    if umt_i == UMT_ME_PARTIAL_FILL_PASSIVE:
+                        quote.passive_fill(leaves_qty[i], QS_EXECUTED_PART)
+                        side_event[i] = EV_QUOTE_PASSIVELY_EXECUTED_IN_PART # Assign event to message
+                        side_event_num[i] = counter  # Populate EventNum
+                        side_price_lvl[i] = quote.me_prc
+                        side_categorized[i] = True  # Flag message i as categorized
+
+                    # Full passive execution
+                    elif umt_i == UMT_ME_FULL_FILL_PASSIVE:
+                        quote.passive_fill(np.nan, QS_EXECUTED_FULL)
+                        side_event[i] = EV_QUOTE_PASSIVELY_EXECUTED_IN_FULL  # Assign event to message i
+                        side_event_num[i] = counter  # Populate EventNum
+                        side_price_lvl[i] = quote.me_prc
+                        side_categorized[i] = True  # Flag message i as categorized
 
                     # Other partial execution
-                    elif order_msgs.at[i, 'UnifiedMessageType'] == 'ME: Partial Fill (Other)':
-                        order.update_me(q=msgs.at[i, 'LeavesQty'])
-                        msgs.at[i, 'Event'] = 'Order executed in part (other)' # Assign event to message i
-                        msgs.at[i, 'EventNum'] = counter  # Populate EventNum for message i
-                        msgs.at[i, 'PriceLvl'] = order.me_prc
-                        msgs.at[i, 'Categorized'] = True # Flag message i as categorized
+                    elif umt_i == UMT_ME_PARTIAL_FILL_OTHER:
+                        quote.update_me(leaves_qty[i], QS_EXECUTED_PART)
+                        side_event[i] = EV_QUOTE_EXECUTED_IN_PART_OTHER  # Assign event to message i
+                        side_event_num[i] = counter  # Populate EventNum
+                        side_price_lvl[i] = quote.me_prc
+                        side_categorized[i] = True  # Flag message i as categorized
 
                     # Other full execution
-                    elif order_msgs.at[i, 'UnifiedMessageType'] == 'ME: Full Fill (Other)':
-                        order.update_me(q=np.nan)
-                        msgs.at[i, 'Event'] = 'Order executed in full (other)'  # Assign event to message i
-                        msgs.at[i, 'EventNum'] = counter  # Populate EventNum for message i
-                        msgs.at[i, 'PriceLvl'] = order.me_prc
-                        msgs.at[i, 'Categorized'] = True  # Flag message i as categorized
-
-                    # Other cancel accept (NOTE: For missing GW msg due to packet loss.)
-                    elif order_msgs.at[i, 'UnifiedMessageType'] == 'ME: Cancel Accept':
-                        order.update_me(q=msgs.at[i, 'LeavesQty'])
-                        msgs.at[i, 'Event'] = 'Other ME activity'
-                        msgs.at[i, 'EventNum'] = counter
-                        msgs.at[i, 'PrevPriceLvl'] = order.me_prc
-                        msgs.at[i, 'Categorized'] = True
-                        order_testing_counter['other_me_activity'] += 1 # testing counter
-
-                    # Other cancel/replace accept (For missing GW msg due to packet loss.)
-                    elif order_msgs.at[i, 'UnifiedMessageType'] == 'ME: Cancel/Replace Accept':
-                        msgs.at[i, 'PrevPriceLvl'] = order.me_prc
-                        order.amend()
-                        order.update_me(q=msgs.at[i, 'LeavesQty'])
-                        msgs.at[i, 'Event'] = 'Other ME activity'
-                        msgs.at[i, 'EventNum'] = counter  # Populate EventNum
-                        msgs.at[i, 'Categorized'] = True  # Flag message j as categorized
-                        order_testing_counter['other_me_activity'] += 1 # testing counter
-                        
-                    # ME Order Expire
-                    elif order_msgs.at[i, 'UnifiedMessageType'] == 'ME: Order Expire':
-                        order.update_me(q=np.nan)
-                        msgs.at[i, 'Event'] = 'Other ME activity'  # Assign event to message i
-                        msgs.at[i, 'EventNum'] = counter  # Populate EventNum
-                        msgs.at[i, 'PriceLvl'] = order.me_prc
-                        msgs.at[i, 'Categorized'] = True  # Flag message j as categorized
+                    elif umt_i == UMT_ME_FULL_FILL_OTHER:
+                        quote.update_me(np.nan, QS_EXECUTED_FULL)
+                        side_event[i] = EV_QUOTE_EXECUTED_IN_FULL_OTHER  # Assign event to message i
+                        side_event_num[i] = counter  # Populate EventNum
+                        side_price_lvl[i] = quote.me_prc
+                        side_categorized[i] = True  # Flag message i as categorized
+
+                    # Other cancel accept (For outbounds whose corresponding inbounds are missing due to packet loss.)
+                    elif umt_i == UMT_ME_CANCEL_ACCEPT:
+                        quote.update_me(leaves_qty[i], QS_CANCELLED)
+                        side_event[i] = EV_OTHER_ME_ACTIVITY
+                        side_event_num[i] = counter
+                        side_prev_price_lvl[i] = quote.me_prc
+                        side_categorized[i] = True
+                        quote_testing_counter['other_me_activity'] += 1 # testing counter
+
+                    # Other cancel/replace accept (For outbounds whose corresponding inbounds are missing due to packet loss.)
+                    elif umt_i == UMT_ME_CANCEL_REPLACE_ACCEPT:
+                        side_prev_price_lvl[i] = quote.me_prc
+                        quote.update_me(np.nan, QS_AMENDED)
+                        side_event[i] = EV_OTHER_ME_ACTIVITY
+                        side_event_num[i] = counter # Populate EventNum
+                        side_categorized[i] = True # Flag message j as categorized
+                        quote_testing_counter['other_me_activity'] += 1 # testing counter
 
                     # Other ME activity
                     else:
-                        order.update_me(q=msgs.at[i, 'LeavesQty'])
-                        msgs.at[i, 'Event'] = 'Other ME activity'
-                        msgs.at[i, 'EventNum'] = counter
-                        msgs.at[i, 'Categorized'] = True
-                        order_testing_counter['other_me_activity'] += 1 # testing counter
-
-                # Other outbound cases 
-                # For other outbound cases where an inbound cannot be found (packet loss), 
-                # we classify them into 'Other ME activity' here. If their inbounds could be
-                # found, we would have already categorized them in the previous sections.
-                # This includes the following Type of outbound: 
+                        side_event[i] = EV_OTHER_ME_ACTIVITY  # Assign event to message i
+                        side_event_num[i] = counter  # Populate EventNum
+                        side_price_lvl[i] = quote.me_prc
+                        side_categorized[i] = True  # Flag message i as categorized
+                        if umt_i == UMT_ME_ORDER_REJECT:
+                            quote.update_me(leaves_qty[i], QS_REJECTED)
+                        elif umt_i == UMT_ME_ORDER_SUSPEND:
+                            quote.update_me(leaves_qty[i], QS_SUSPENDED)
+                        elif umt_i == UMT_ME_ORDER_EXPIRE:
+                            quote.update_me(leaves_qty[i], QS_EXPIRED)
+                        elif umt_i == UMT_ME_NEW_ORDER_ACCEPT:
+                            quote.update_me(leaves_qty[i], QS_ACCEPTED)
+                        quote_testing_counter['other_me_activity'] += 1 # testing counter
+
+                # Matching Engine Message (other side)
+                elif msg_type[i] == MT_EXECUTION_REPORT and msg_side[i] == op_side:
+                    side_categorized[i] = True  # Flag message i as categorized
+
+                # This includes the following Type: 
                 # 'ME: Cancel Reject (TLTC)', 'ME: Cancel Reject (Other), 
                 # 'ME: Other Reject',
-                # and classifies message i in the following Events:
-                # 'Other ME activity' 
-                elif order_msgs.at[i, 'MessageType'] in ('Other_Reject', 'Cancel_Reject', 'Other_Outbound'):
-                    counter += 1
-                    msgs.at[i, 'Event'] = 'Other ME activity'
-                    msgs.at[i, 'EventNum'] = counter
-                    msgs.at[i, 'Categorized'] = True
-                    order_testing_counter['other_me_activity'] += 1
-
-        ## Quotes
-        # Note that for data from exchanges without quotes, simply set QuoteRelated to False
-        # for all messages and this section will be automatically skipped.
-        # 
-        # A quote is different from an order:
-        #     1. A quote is a two-sided, executable, limit order valid for the day.
-        #     2. Only qualified users (market makers) can use quote and each 
-        #        user can only have one active quote at a time.
-        #     3. When one side of the quote is fully filled, 
-        #        the other side will NOT be cancelled automatically.
-        # 
-        # Some quote related messages can have effect on one or two sides while others can only 
-        # have effects on both sides:
-        #     1. New_Quote message when there is no active quote from the user: act on both sides only.
-        #     2. New_Quote message to modify an existing quote: act on one or two sides.
-        #     3. Cancel_Request: act on both sides (one can only cancel both sides of the quote).
-        #     4. Rejects: when a New_Quote is rejected, it is rejected on both sides.
-        # 
-        # Loop over quote related messages on each side
-        # Inbound messages only trigger outbound messages on the side (or sides) that they update. 
-        # It is possible to see a quote related inbound but there is no outbound on one side
-        # because that inbound only has an effect on one side.
-        # An outbound on one side is expected if the quote changes the price/quantity of that side
-        # or updates from missing. We look for the outbound message only if we expect there is an 
-        # outbound on that side. This is because we need to know whether missing an outbound on 
-        # one side is normal (because the quote inbound does not affect this side), 
-        # or due to packet loss.
-        #
-        # Simple Quote Example (Common Case) - 'Quote Updated' Event using 'Gateway New Quote' that outbounds 'ME: Cancel/Replace Accept'
-        # 
-        #     Action: Participant sent Gateway New Order (MessageType == 'New_Quote') with an updated bid/ask quote and the ME 
-        #             cancelled the previous quote and replaced it with the new bid/ask quote
-        # 
-        #     Event Classification process:
-        # 
-        #         Summary: Loop over messages until we get to our inbound Gateway New Quote message and then we check the 
-        #                  subsequent messages until we find an outbound 'ME: Cancel/Replace Accept' message. We assign both messages
-        #                  to the same EventNum and label the Event 'Native Quote Updated'
-        # 
-        #         1. Loop over msgs for the user on Bid and Ask sides until you get to the new quote message
-        #         2. Check that MessageType == 'New_Quote' and whether the message has already been categorized
-        #         3. Assign an EventNum to the message and set Categorized to True
-        #         4. Loop over subsequent messages. For each subsequent message, check if we expect a ME response and whether the 
-        #            new message has already been categorized
-        #         5. Check new messages' UnifiedMessageType until UnifiedMessageType == 'ME: Cancel/Replace Accept' 
-        #         6. Then, assign the inbound quote message EventNum to the new message (they are now part of the same Event),
-        #            and set the Event of the inbound message to 'Native Quote Updated'
-        #         7. Terminate the second loop, and move on to the next message
-        # 
-        #       Result: The inbound 'Gateway New Quote' message and the outbound 'ME: Cancel/Replace Accept' message form an Event 
-        #               labeled 'Native Quote Updated' with number EventNum.
-        # 
-
-        if sum(user_msgs['QuoteRelated'] > 0):
-
-            order_msgs = user_msgs.loc[user_msgs['QuoteRelated']]
-            
-            # Loop over both Sides as each quote can update one side or both sides.
-            # Categorize Bid and Ask events separately
-            for S in ['Bid', 'Ask']:
-
-                counter = 0 # Initialize event counter
-
-                quote = Quote()
-
-                for i in order_msgs.index:
-
-                    # Skip previously categorized messages
-                    if msgs.at[i, '%sCategorized' % S]:
-                        continue
-
-                    # Gateway New Quote
-                    # This includes the following Unified Message Types:  'Gateway New Quote'
-                    # and classifies message i in the following Events:
-                    # 'New quote accepted', 'New quote updated', 
-                    # 'New quote aggressively executed in full',
-                    # 'New quote aggressively executed in part', 
-                    # 'New quote expired', 'New quote failed',
-                    # 'New quote suspended', 'New quote no response'
-                    elif order_msgs.at[i, 'MessageType'] == 'New_Quote':
-                        quote.update(p=msgs.at[i, '%sPrice' % S], q=order_msgs.at[i, '%sSize' % S])
-                        quote.update_expectations()
-                        counter += 1  # Increment event counter
-                        pcounter = counter # counter for passive events
-                        msgs.at[i, '%sEventNum' % S] = counter  # Populate EventNum
-                        msgs.at[i, 'Prev%sPriceLvl' % S] = quote.cancel_prc
-                        msgs.at[i, '%sPriceLvl' % S] = quote.gw_prc
-                        msgs.at[i, '%sCategorized' % S] = True # Flag message i as categorized
-                        resolved_i = False  # Initialize indicator for loop
-
-                        # Loop over subsequent messages
-                        opposite_side_accepts = 0
-
-                        # Skip to next iteration of loop if we do not expect ME message 
-                        if not (quote.expect_add or quote.expect_amend):
-                            # Testing counter for no reply expected after a quote
-                            quote_testing_counter['quote_reply_not_exp'] += 1
-                            resolved_i = True
-                            continue
-                        
-                        # Loop over subsequent messages to assign the event to message i based on outbound messages
-                        # of the following Unified Message Types:
-                        # ME: New Order Accept, ME: Order Reject, 
-                        # ME: Partial Fill (P), ME: Partial Fill (A),
-                        # ME: Full Fill (P), ME: Full Fill (A), 
-                        # ME: Order Expire, ME: Order Suspend,
-                        # ME: Other Reject, 'ME: Cancel/Replace Accept'
-                        for j in order_msgs.index[order_msgs.index > i]:
-                            
-                            # Skip if message j has already been categorized
-                            if msgs.at[j, '%sCategorized' % S]:
-                                continue
-
-                            # If message j is on the opposite side of the current loop
-                            # (we loop through Bid and Ask separately), we need to 
-                            # decide whether to break, pass, or continue:
-                            #     1. If there have been two accepts on the opposite side 
-                            #        after the new quote inbound, then this means outbound j 
-                            #        is already in the next quote event. The event on the current side
-                            #        must be ended due to serial processing of messages. 
-                            #        Hence we break from the loop.
-                            #     2. Else if message j is a reject, a reject on either side indicates a 
-                            #        reject on both sides. So we let the message go through the event
-                            #        classification code and it will be categorized as a reject event.
-                            #     3. Else, we continue the loop to the next message 
-                            #        because we are doing the classification for two sides separately
-                            #        and message j is on the opposite side. It is not a reject, so it 
-                            #        does not affect the event of the current side of the loop.
-
-                            if order_msgs.at[j, 'Side'] == opposite(S):
-                                opposite_side_accepts += order_msgs.at[j, 'UnifiedMessageType'] in ('ME: Cancel/Replace Accept', 'ME: New Order Accept')
-                                if opposite_side_accepts > 1:
-                                    # Testing counter for cases in which 2 op accept messages were seen 
-                                    quote_testing_counter['op_side_break'] += 1
-                                    break
-                                elif order_msgs.at[j, 'UnifiedMessageType'] in ('ME: Order Reject', 'ME: Other Reject'):
-                                    pass
-                                else:
-                                    continue
-
-                            # Break if next ME message has different ClientOrderID
-                            # This assumes that Gateway New Order messages are processed serially in order
-                            # of submission. This assumption should be fine within a UserID.
-                            # Note that we require the MessageType to be Execution_Report, in addition to 
-                            # having a different ClientOrderID to break. The purpose of the additional 
-                            # requirement on MessageType is to let cancels go through this check instead of break.
-                            # With perfect data, this should not bind.
-                            if order_msgs.at[j, 'ClientOrderID'] != order_msgs.at[i, 'ClientOrderID']:
-                                # if order_msgs.at[j, 'MessageType'] == 'Execution_Report':
-                                break
-
-                            # ME New Order Accept 
-                            if (order_msgs.at[j, 'UnifiedMessageType'] == 'ME: New Order Accept'):
-                                quote.update_me(q=order_msgs.at[j, 'LeavesQty'], st='Accepted (0)')
-                                msgs.at[i, '%sEvent' % S] = 'New quote accepted'  # Assign event to message i
-                                msgs.at[j, '%sEventNum' % S] = counter  # Populate EventNum
-                                msgs.at[j, '%sPriceLvl' % S] = quote.me_prc
-                                msgs.at[j, '%sCategorized' % S] = True  # Flag message j as categorized
-                                resolved_i = True  # Update indicator
-
-                            # ME Cancel/Replace Accept
-                            elif (order_msgs.at[j, 'UnifiedMessageType'] == 'ME: Cancel/Replace Accept'):
-                                quote.update_me(q=order_msgs.at[j, 'LeavesQty'], st='Amended (5)')
-                                msgs.at[i, '%sEvent' % S] = 'New quote updated'  # Assign event to message i
-                                msgs.at[j, '%sEventNum' % S] = counter  # Populate EventNum
-                                msgs.at[j, 'Prev%sPriceLvl' % S] = quote.cancel_prc
-                                msgs.at[i, 'Prev%sQty' % S] = quote.cancel_qty
-                                msgs.at[j, '%sPriceLvl' % S] = quote.me_prc
-                                msgs.at[j, '%sCategorized' % S] = True  # Flag message j as categorized
-                                resolved_i = True  # Update indicator
-
-                            # ME Full Fill - Passive
-                            # This block allows us to pass over passive fill messages that occur immediately after
-                            # Gateway order submission. Otherwise, we would break the loop on observing a passive fill.
-                            # The point is to simplify the code. Note that we only categorize message j here, i is not categorized.
-                            elif order_msgs.at[j, 'UnifiedMessageType'] == 'ME: Full Fill (P)':
-                                pcounter += 1
-                                quote.passive_fill(leaves=np.nan, st='Executed (2)')
-                                msgs.at[j, '%sEvent' % S] = 'Quote passively executed in full'
-                                msgs.at[j, '%sEventNum' % S] = pcounter
-                                msgs.at[j, '%sPriceLvl' % S] = quote.me_prc  # Assume fill at prev ME limit price
-                                msgs.at[j, '%sCategorized' % S] = True
-
-                            # ME Full Fill - Aggressive
-                            elif order_msgs.at[j, 'UnifiedMessageType'] == 'ME: Full Fill (A)':
-                                quote.update_me(q=msgs.at[j, 'LeavesQty'], st='Executed (2)')
-                                msgs.at[i, '%sEvent' % S] = 'New quote aggressively executed in full'  # Assign event to message i
-                                msgs.at[i, '%sMinExecPriceLvl' % S] = msgs.at[j, 'ExecutedPrice']
-                                msgs.at[i, '%sMaxExecPriceLvl' % S] = msgs.at[j, 'ExecutedPrice']
-                                msgs.at[j, '%sEventNum' % S] = counter  # Populate EventNum
-                                msgs.at[j, '%sPriceLvl' % S] = quote.me_prc
-                                msgs.at[j, '%sCategorized' % S] = True  # Flag message j as categorized
-                                resolved_i = True  # Update indicator
-
-                            # ME Partial Fill - Passive
-                            # This block allows us to pass over passive fill messages that occur immediately after
-                            # Gateway order submission. Otherwise, we break the loop on observing a passive fill.
-                            # The point is to simplify the code. Note that we only categorize message j here, i is not categorized.
-                            elif order_msgs.at[j, 'UnifiedMessageType'] == 'ME: Partial Fill (P)':
-                                pcounter += 1
-                                quote.passive_fill(leaves=msgs.at[j, 'LeavesQty'], st='Executed (1)')
-                                msgs.at[j, '%sEvent' % S] = 'Quote passively executed in part'
-                                msgs.at[j, '%sEventNum' % S] = pcounter
-                                msgs.at[j, '%sPriceLvl' % S] = quote.me_prc  # Assume fill at prev ME limit price
-                                msgs.at[j, '%sCategorized' % S] = True
-
-                            # ME Partial Fill - A is Aggressive
-                            elif order_msgs.at[j, 'UnifiedMessageType'] == 'ME: Partial Fill (A)':
-                                quote.update_me(q=msgs.at[j, 'LeavesQty'], st='Executed (1)')
-                                executed_prices = [msgs.at[j, 'ExecutedPrice']]
-                                msgs.at[i, '%sEvent' % S] = 'New quote aggressively executed in part'
-                                msgs.at[i, '%sMinExecPriceLvl' % S] = min(executed_prices)
-                                msgs.at[i, '%sMaxExecPriceLvl' % S] = max(executed_prices)
-                                msgs.at[j, '%sEventNum' % S] = counter  # Populate EventNum
-                                msgs.at[j, '%sPriceLvl' % S] = quote.gw_prc
-                                msgs.at[j, '%sCategorized' % S] = True  # Flag message j as categorized
-                                resolved_j = False  # Initialize indicator for loop
-
-                                # Loop over subsequent messages
-                                # This loop either completes the event on the aggressive partial fill or 
-                                # checks remaining messages for additional partial fills or full fills
-                                for k in order_msgs.index[order_msgs.index > j]:
-
-                                    # Skip if message has already been categorized
-                                    if msgs.at[k, '%sCategorized' % S]:
-                                        continue
-                                    # For messages on the opposite side (see previous comments)
-                                    if order_msgs.at[k, 'Side'] == opposite(S):
-                                        opposite_side_accepts += order_msgs.at[k, 'UnifiedMessageType'] in ('ME: Cancel/Replace Accept', 'ME: New Order Accept')
-                                        if opposite_side_accepts > 1:
-                                            quote_testing_counter['op_side_break'] += 1
-                                            break
-                                        elif order_msgs.at[k, 'UnifiedMessageType'] in ('ME: Order Reject', 'ME: Other Reject'):
-                                            pass
-                                        else:
-                                            continue
-                                    # Break if next ME message has different ClientOrderID
-                                    # See previous comments for details. 
-                                    if order_msgs.at[k, 'ClientOrderID'] != order_msgs.at[i, 'ClientOrderID']:
-                                        # if msgs.at[k, 'MessageType'] == 'Execution_Report':
-                                        break
-
-                                    # ME Full Fill
-                                    if order_msgs.at[k, 'UnifiedMessageType'] == 'ME: Full Fill (A)':
-                                        quote.update_me(q=msgs.at[k, 'LeavesQty'], st='Executed (2)')
-                                        executed_prices = executed_prices + [msgs.at[k, 'ExecutedPrice']]
-                                        msgs.at[i, '%sEvent' % S] = 'New quote aggressively executed in full'  # Assign event to message i
-                                        msgs.at[i, '%sMinExecPriceLvl' % S] = min(executed_prices)
-                                        msgs.at[i, '%sMaxExecPriceLvl' % S] = max(executed_prices)
-                                        msgs.at[k, '%sEventNum' % S] = counter # Populate EventNum
-                                        msgs.at[k, '%sPriceLvl' % S] = quote.gw_prc
-                                        msgs.at[k, '%sCategorized' % S] = True # Flag message k as categorized
-                                        resolved_j, resolved_i = True, True  # Update indicators
-
-                                    # ME Partial Fill
-                                    elif order_msgs.at[k, 'UnifiedMessageType'] == 'ME: Partial Fill (A)':
-                                        quote.update_me(q=msgs.at[k, 'LeavesQty'], st='Executed (1)')
-                                        executed_prices = executed_prices + [msgs.at[k, 'ExecutedPrice']]
-                                        msgs.at[i, '%sMinExecPriceLvl' % S] = min(executed_prices)
-                                        msgs.at[i, '%sMaxExecPriceLvl' % S] = max(executed_prices)
-                                        msgs.at[k, '%sEventNum' % S] = counter  # Populate EventNum
-                                        msgs.at[k, '%sPriceLvl' % S] = quote.gw_prc
-                                        msgs.at[k, '%sCategorized' % S] = True  # Flag message k as categorized
-
-                                    # Other ME Message
-                                    # e.g. Cancel accept and passive fill messages would fall into this category
-                                    elif order_msgs.at[k, 'MessageType'] == 'Execution_Report':
-                                        quote_testing_counter['partial_other_me'] += 1 # Testing counter
-                                        if order_msgs.at[k, 'UnifiedMessageType'] in ('ME: Partial Fill (P)', 'ME: Full Fill (P)'):
-                                            quote_testing_counter['partial_me_passive'] += 1 # Testing counter
-                                        elif order_msgs.at[k, 'UnifiedMessageType'] == 'ME: Cancel Accept':
-                                            quote_testing_counter['partial_me_cancel'] += 1 # Testing counter
-                                        break
-                                        
-                                    if resolved_j:
-                                        break
-
-                                # No further ME Response
-                                # No further ME response after an aggressive partial fill.
-                                # e.g. the quote traded aggressively in part and the rest is post to book.
-                                # In LSE, the matching engine will not send a post-to-book confirmation in this case.
-                                if not resolved_j:
-                                    quote_testing_counter['pf_no_further_reply'] += 1
-                                    resolved_i = True
-
-                            # ME Order Reject 
-                            # If there is a reject on either side, the entire quote is rejected
-                            elif order_msgs.at[j, 'UnifiedMessageType'] in ('ME: Order Reject', 'ME: Other Reject'):
-                                quote.update_me(q=np.nan, st='Rejected (8)')
-                                msgs.at[i, '%sEvent' % S] = 'New quote failed'  # Assign event to message i
-                                msgs.at[j, '%sEventNum' % S] = counter  # Populate EventNum
-                                msgs.at[j, '%sPriceLvl' % S] = quote.gw_prc
-                                msgs.at[j, '%sCategorized' % S] = True  # Flag message j as categorized
-                                resolved_i = True  # Update indicator
-
-                            # ME Order Expire
-                            elif order_msgs.at[j, 'UnifiedMessageType'] == 'ME: Order Expire':
-                                quote.update_me(q=np.nan, st='Expired (6)')
-                                msgs.at[i, '%sEvent' % S] = 'New quote expired'  # Assign event to message i
-                                msgs.at[j, '%sEventNum' % S] = counter  # Populate EventNum
-                                msgs.at[j, '%sPriceLvl' % S] = quote.gw_prc
-                                msgs.at[j, '%sCategorized' % S] = True  # Flag message j as categorized
-                                resolved_i = True  # Update indicator
-
-                            # ME Order Suspend
-                            elif order_msgs.at[j, 'UnifiedMessageType'] == 'ME: Order Suspend':
-                                quote.update_me(q=msgs.at[j, 'LeavesQty'], st='Suspended (9)')
-                                msgs.at[i, '%sEvent' % S] = 'New quote suspended'  # Assign event to message i
-                                msgs.at[j, '%sEventNum' % S] = counter  # Populate EventNum
-                                msgs.at[j, '%sPriceLvl' % S] = quote.me_prc
-                                msgs.at[j, '%sCategorized' % S] = True  # Flag message j as categorized
-                                resolved_i = True  # Update indicator
-
-                            # Other ME Message
-                            # e.g. Cancel accept messages would fall into this category 
-                            # This should not happen with perfect data since there shouldn't be
-                            # a cancel accept following a New_Quote message
-                            elif order_msgs.at[j, 'MessageType'] == 'Execution_Report':
-                                quote_testing_counter['nqt_other_me'] += 1
-                                if order_msgs.at[j, 'UnifiedMessageType'] == 'ME: Cancel Accept':
-                                    quote_testing_counter['nqt_me_cancel'] += 1
-                                break
-                            
-                            if resolved_i:
-                                break                        
-
-                        # No ME Response
-                        # In new orders this category would parallel "New order no response"
-                        if not resolved_i:
-                            # testing counter for cases in which 2 op messages were seen 
-                            quote_testing_counter['expected_never_arrived'] += 1
-                            msgs.at[i, '%sEvent' % S] = 'New quote no response'  # Assign event to message i
-                            quote.no_me_response()
-
-                        # Update counter
-                        # pcounter was incremented by passive events. This ensures we do not 
-                        # have the same event numbers for passive and aggressive events
-                        counter = pcounter
-                        
-                    # Gateway Cancel
-                    # This includes the following Unified Message Types: 'Gateway Quote Cancel'
-                    # and classifies message i in the following Events:
-                    # 'Quote cancel accepted', 'Quote cancel failed', 'Quote cancel rejected', 
-                    # 'Quote cancel no response'
-                    elif order_msgs.at[i, 'MessageType'] == 'Cancel_Request':
-                        counter += 1  # Increment event counter 
-                        quote.update_expectations()
-                        msgs.at[i, '%sEventNum' % S] = counter  # Populate EventNum
-                        msgs.at[i, 'Prev%sPriceLvl' % S] = quote.gw_prc  # Assume cancel occurs at price level of last
-                        msgs.at[i, '%sCategorized' % S] = True  # Flag message i as categorized
-                        resolved_i = False  # Initialize indicator for loop
-                        
-                        # Break if expect cancel is false
-                        if quote.expect_cancel == False:
-                            # testing counter for no reply expected after a quote
-                            quote_testing_counter['quote_reply_not_exp'] += 1
-                            resolved_i = True
-                            continue
-
-                        # Loop over subsequent messages to assign the event to message i based on outbound messages
-                        # of the following Unified Message Types:
-                        # 'ME: Order Reject', 'ME: Protocol Reject', 'ME: Business Reject', 'ME: Cancel Accept',
-                        # 'ME: Cancel Reject (TLTC)', 'ME: Cancel Reject (Other)'
-                        for j in order_msgs.index[order_msgs.index > i]:
-                            
-                            # Continue to the next message and skip j if 
-                            # message j has already been categorized. 
-                            if msgs.at[j, '%sCategorized' % S]:
-                                continue
-
-                            # If message j is on the opposite side of the loop:
-                            # If message j is a cancel reject, then let message j go through 
-                            # the event classification code below. Since a reject will have
-                            # an effect on both sides.
-                            # Else if message 
-                            # we see a new order accept on the opposite side.
-                            # Else, continue the loop: skip message j and go to the next one
-                            # since j is on the opposite side and has no effect on the current 
-                            # side of the loop.
-                            if order_msgs.at[j, 'Side'] == opposite(S):
-                                if order_msgs.at[j, 'UnifiedMessageType'] in ('ME: Cancel Reject (Other)', 'ME: Cancel Reject (TLTC)', 'ME: Other Reject'):
-                                    pass
-                                elif order_msgs.at[j, 'UnifiedMessageType'] in  ('ME: Cancel/Replace Accept', 'ME: New Order Accept'):
-                                    quote_testing_counter['op_side_break'] += 1
-                                    break
-                                else:
-                                    continue
-                            
-                            if order_msgs.at[j, 'ClientOrderID'] != order_msgs.at[i, 'ClientOrderID']:
-                                # if order_msgs.at[j, 'MessageType'] == 'Execution_Report':
-                                break
-
-                            # Break on next ME: New Order Accept 
-                            # Because this means we enter the next event of the current side of the loop
-                            if order_msgs.at[j, 'UnifiedMessageType'] == 'ME: New Order Accept':
-                                break
-
-                            # ME Cancel Accept
-                            if order_msgs.at[j, 'UnifiedMessageType'] == 'ME: Cancel Accept':
-                                quote.cancel()
-                                msgs.at[i, '%sEvent' % S] = 'Quote cancel accepted'  # Assign event to message i
-                                msgs.at[j, '%sEventNum' % S] = counter  # Populate EventNum
-                                msgs.at[j, 'Prev%sPriceLvl' % S] = quote.cancel_prc
-                                msgs.at[i, 'Prev%sQty' % S] = quote.cancel_qty
-                                msgs.at[j, '%sCategorized' % S] = True  # Flag message j as categorized
-                                resolved_i = True  # Update indicator
-
-                            # ME Cancel Reject (TLTC = To Late to Cancel)
-                            # This is the event used for failed cancels in the race detection
-                            elif order_msgs.at[j, 'UnifiedMessageType'] == 'ME: Cancel Reject (TLTC)':
-                                quote.cancel_reject()
-                                msgs.at[i, '%sEvent' % S] = 'Quote cancel rejected'  # Assign event to message i
-                                msgs.at[j, '%sEventNum' % S] = counter  # Populate EventNum
-                                msgs.at[j, 'Prev%sPriceLvl' % S] = quote.cancel_prc
-                                msgs.at[i, 'Prev%sQty' % S] = quote.cancel_qty
-                                msgs.at[j, '%sCategorized' % S] = True  # Flag message j as categorized
-                                resolved_i = True  # Update indicator
-
-                            # ME Cancel Reject 
-                            # If there is a reject on either side, the entire quote is rejected
-                            elif order_msgs.at[j, 'UnifiedMessageType'] in ('ME: Cancel Reject (Other)', 'ME: Protocol Reject', 'ME: Business Reject'):
-                                quote.cancel_reject()
-                                msgs.at[i, '%sEvent' % S] = 'Quote cancel failed'  # Assign event to message i
-                                msgs.at[j, '%sEventNum' % S] = counter  # Populate EventNum
-                                msgs.at[j, 'Prev%sPriceLvl' % S] = quote.cancel_prc
-                                msgs.at[i, 'Prev%sQty' % S] = quote.cancel_qty
-                                msgs.at[j, '%sCategorized' % S] = True  # Flag message j as categorized
-                                resolved_i = True  # Update indicator
-
-                            # Testing counter for other outbound messages
-                            elif order_msgs.at[j, 'MessageType'] == 'Execution_Report' and order_msgs.at[j, 'Side'] == S:
-                                quote_testing_counter['cancel_other_me'] += 1 # testing counter
-                            
-                            if resolved_i:
-                                break
+                # They might be left uncategorized due to packet loss (missing the inbound).
+                # We classify those messages into the following Events:
+                # 'Other ME activity'
+                elif (1 << umt_i) & NON_EXECUTION_OUTBOUND_MASK:
+                    counter += 1  # Increment event counter
+                    side_event[i] = EV_OTHER_ME_ACTIVITY  # Assign event to message i
+                    side_event_num[i] = counter  # Populate EventNum
+                    side_categorized[i] = True  # Flag message i as categorized
+
+    # Add the classification variables to msgs
+    # Event codes are converted to categoricals of the event names (empty string for missing value)
+    # and event numbers to nullable integers (-1 becomes missing). Integer event numbers are also
+    # written to the output file without the trailing '.0', which is faster than float formatting.
+    # The columns are added in a single concat rather than one insert per column
+    for col in ('Event', 'BidEvent', 'AskEvent'):
+        event_vars[col] = pd.Categorical.from_codes(event_vars[col], categories=event_names)
+    for col in ('EventNum', 'BidEventNum', 'AskEventNum'):
+        event_vars[col] = pd.arrays.IntegerArray(event_vars[col], event_vars[col] < 0)
+    msgs = pd.concat([msgs, pd.DataFrame(event_vars, index=msgs.index)], axis=1)
 
-                        # No ME Response
-                        if not resolved_i:
-                            msgs.at[i, '%sEvent' % S] = 'Quote cancel no response'  # Assign event to message i
-                            quote.no_me_response()
-                            quote_testing_counter['cancel_no_reply'] += 1 # testing counter
-
-                # Execution Report - passive, other fills and reject cases for outbounds
-                # These messages refer to passive fills and to outbound messages
-                # with missing inbound messages (packet loss)
-                # This includes the following Type: 'ME: Partial Fill (P)', 'ME: Full Fill (P)', 'ME: Partial Fill (Other)',
-                # 'ME: Full Fill (Other)', 'ME: Cancel Accept', 'ME: Cancel/Replace Accept', 'ME: Order Reject', 'ME: Order Suspend'
-                # 'ME: New Order Accept', 'ME: Order Expire'
-                # and classifies message i in the following Events:
-                # 'Quote passively executed in part', 'Quote passively executed in full', 
-                # 'Quote executed in part (other), 'Quote executed in full (other), 'Other ME activity'
-                    elif order_msgs.at[i, 'MessageType'] == 'Execution_Report' and order_msgs.at[i, 'Side'] == S:
-
-                        counter += 1  # Increment event counter
-
-                        # Partial passive execution
-                        if order_msgs.at[i, 'UnifiedMessageType'] == 'ME: Partial Fill (P)':
-                            quote.passive_fill(leaves=msgs.at[i, 'LeavesQty'], st='Executed (1)')
-                            msgs.at[i, '%sEvent' % S] = 'Quote passively executed in part' # Assign event to message
-                            msgs.at[i, '%sEventNum' % S] = counter  # Populate EventNum
-                            msgs.at[i, '%sPriceLvl' % S] = quote.me_prc
-                            msgs.at[i, '%sCategorized' % S] = True  # Flag message i as categorized
-
-                        # Full passive execution
-                        elif order_msgs.at[i, 'UnifiedMessageType'] == 'ME: Full Fill (P)':
-                            quote.passive_fill(leaves=np.nan, st='Executed (2)')
-                            msgs.at[i, '%sEvent' % S] = 'Quote passively executed in full'  # Assign event to message i
-                            msgs.at[i, '%sEventNum' % S] = counter  # Populate EventNum
-                            msgs.at[i, '%sPriceLvl' % S] = quote.me_prc
-                            msgs.at[i, '%sCategorized' % S] = True  # Flag message i as categorized
-
-                        # Other partial execution
-                        elif order_msgs.at[i, 'UnifiedMessageType'] == 'ME: Partial Fill (Other)':
-                            quote.update_me(q=msgs.at[i, 'LeavesQty'], st='Executed (1)')
-                            msgs.at[i, '%sEvent' % S] = 'Quote executed in part (other)'  # Assign event to message i
-                            msgs.at[i, '%sEventNum' % S] = counter  # Populate EventNum
-                            msgs.at[i, '%sPriceLvl' % S] = quote.me_prc
-                            msgs.at[i, '%sCategorized' % S] = True  # Flag message i as categorized
-
-                        # Other full execution
-                        elif order_msgs.at[i, 'UnifiedMessageType'] == 'ME: Full Fill (Other)':
-                            quote.update_me(q=np.nan, st='Executed (2)')
-                            msgs.at[i, '%sEvent' % S] = 'Quote executed in full (other)'  # Assign event to message i
-                            msgs.at[i, '%sEventNum' % S] = counter  # Populate EventNum
-                            msgs.at[i, '%sPriceLvl' % S] = quote.me_prc
-                            msgs.at[i, '%sCategorized' % S] = True  # Flag message i as categorized
-
-                        # Other cancel accept (For outbounds whose corresponding inbounds are missing due to packet loss.)
-                        elif order_msgs.at[i, 'UnifiedMessageType'] == 'ME: Cancel Accept':
-                            quote.update_me(q=msgs.at[i, 'LeavesQty'], st='Cancelled (4)')
-                            msgs.at[i, '%sEvent' % S] = 'Other ME activity'
-                            msgs.at[i, '%sEventNum' % S] = counter
-                            msgs.at[i, 'Prev%sPriceLvl' % S] = quote.me_prc
-                            msgs.at[i, '%sCategorized' % S] = True
-                            quote_testing_counter['other_me_activity'] += 1 # testing counter
-
-                        # Other cancel/replace accept (For outbounds whose corresponding inbounds are missing due to packet loss.)
-                        elif order_msgs.at[i, 'UnifiedMessageType'] == 'ME: Cancel/Replace Accept':
-                            msgs.at[i, 'Prev%sPriceLvl' % S] = quote.me_prc
-                            quote.update_me(st='Amended (5)')
-                            msgs.at[i, '%sEvent' % S] = 'Other ME activity'
-                            msgs.at[i, '%sEventNum' % S] = counter # Populate EventNum
-                            msgs.at[i, '%sCategorized' % S] = True # Flag message j as categorized
-                            quote_testing_counter['other_me_activity'] += 1 # testing counter
-
-                        # Other ME activity
-                        else:
-                            msgs.at[i, '%sEvent' % S] = 'Other ME activity'  # Assign event to message i
-                            msgs.at[i, '%sEventNum' % S] = counter  # Populate EventNum
-                            msgs.at[i, '%sPriceLvl' % S] = quote.me_prc
-                            msgs.at[i, '%sCategorized' % S] = True  # Flag message i as categorized
-                            if order_msgs.at[i, 'UnifiedMessageType'] == 'ME: Order Reject':
-                                quote.update_me(q=msgs.at[i, 'LeavesQty'], st='Rejected (8)')
-                            elif order_msgs.at[i, 'UnifiedMessageType'] == 'ME: Order Suspend':
-                                quote.update_me(q=msgs.at[i, 'LeavesQty'], st='Suspended (9)')
-                            elif order_msgs.at[i, 'UnifiedMessageType'] == 'ME: Order Expire':
-                                quote.update_me(q=msgs.at[i, 'LeavesQty'], st='Expired (6)')
-                            elif order_msgs.at[i, 'UnifiedMessageType'] == 'ME: New Order Accept':
-                                quote.update_me(q=msgs.at[i, 'LeavesQty'], st='Accepted (0)')
-                            quote_testing_counter['other_me_activity'] += 1 # testing counter
-
-                    # Matching Engine Message (other side)
-                    elif order_msgs.at[i, 'MessageType'] == 'Execution_Report' and order_msgs.at[i, 'Side'] == opposite(S):
-                        msgs.at[i, '%sCategorized' % S] = True  # Flag message i as categorized
-
-                    # This includes the following Type: 
-                    # 'ME: Cancel Reject (TLTC)', 'ME: Cancel Reject (Other), 
-                    # 'ME: Other Reject',
-                    # They might be left uncategorized due to packet loss (missing the inbound).
-                    # We classify those messages into the following Events:
-                    # 'Other ME activity'
-                    elif order_msgs.at[i, 'UnifiedMessageType'] in ('ME: Cancel Reject (TLTC)','ME: Cancel Reject (Other)','ME: Other Reject', 'ME: Other Outbound'):
-                        counter += 1  # Increment event counter
-                        msgs.at[i, '%sEvent' % S] = 'Other ME activity'  # Assign event to message i
-                        msgs.at[i, '%sEventNum' % S] = counter  # Populate EventNum
-                        msgs.at[i, '%sCategorized' % S] = True  # Flag message i as categorized
-                        
     ### generate some debugging variables in logs and write output to file
     # Event numbers
     # quote events
-    bidEvent = msgs[msgs['BidEvent'] != ''].shape[0]
-    askEvent = msgs[msgs['AskEvent'] != ''].shape[0]
+    bidEvent = int((msgs['BidEvent'] != '').sum())
+    askEvent = int((msgs['AskEvent'] != '').sum())
     total_quote_events = bidEvent + askEvent
     logger.info('Number Quote Events: %s' % str(total_quote_events))
 
     # order events
-    total_order_events = msgs['Event'].value_counts()[1:].sum()
+    total_order_events = int((msgs['Event'] != '').sum())
     logger.info('Number Order Events: %s' % str(total_order_events))
 
     # Log testing counters
@@ -1598,8 +1881,9 @@ def classify_messages(runtime, date, sym, args, paths):
     ### CONCLUDE ###
     logger.info('Writing to file...')
 
-    # Write to file
-    msgs.to_csv(outfile_msgs, compression = 'gzip', index=False)
+    # Write to file. The classified messages are a temp file that is re-read by
+    # the next step, so use a fast gzip level rather than the default (9)
+    msgs.to_csv(outfile_msgs, compression = {'method': 'gzip', 'compresslevel': 1}, index=False)
 
     # End timer
     timer_end = datetime.datetime.now()
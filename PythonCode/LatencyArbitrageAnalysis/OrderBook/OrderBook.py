@@ -4,8 +4,14 @@ OrderBook.py
 Defines the orderbook object for book updating.
 '''
 
+import operator
+
 import numpy as np
 
+# Top of book (BBO) columns of the top dataframe updated by the order book
+bbo_cols = ['BestBid', 'BestBidQty', 'BestAsk', 'BestAskQty',
+            'BestBid_h', 'BestBidQty_h', 'BestAsk_h', 'BestAskQty_h']
+
 # Define data structure to represent the order book
 class OrderBook(object):
     '''
@@ -24,6 +30,17 @@ class OrderBook(object):
         self._df = df
         self._top = top
         self._depth_updates = depth_updates
+
+        # The BBO columns of top are kept in a NumPy array while updating the book
+        # and written back to top in get_top. Rows of the array are indexed by 
+        # message index, which is the row position in top.
+        assert (top.index == np.arange(top.shape[0])).all(), 'top is not indexed by message position'
+        self._bbo = top[bbo_cols].to_numpy(dtype=float)
+
+        # Order fields read on each level update, as arrays indexed by message position
+        self._unique_order_id = df['UniqueOrderID'].to_numpy()
+        self._display_qty = df['DisplayQty'].to_numpy()
+        self._leaves_qty = df['LeavesQty'].to_numpy()
         
         # Dictionary to reference active price levels
         self.lvls = {}
@@ -45,31 +62,37 @@ class OrderBook(object):
         self.best_ask_h_qty = np.nan
 
     def get_top(self):
+        self._top[bbo_cols] = self._bbo
         return self._top
 
     def get_depth(self):
         return self._depth_updates
 
-    def clean_book(self, S):
+    def clean_book(self, S, P):
         '''
-        Remove levels with zero quantity and nan quantity
+        Remove the level P if it has zero quantity or nan quantity.
+        Only the level that was just updated needs to be checked, 
+        as all other levels were cleaned when they were updated
         '''
-        self.curr_disp[S] = {k:v for k,v in self.curr_disp[S].items() if v > 0}
-        self.curr_total[S] = {k:v for k,v in self.curr_total[S].items() if v > 0}
+        if not self.curr_disp[S][P] > 0:
+            del self.curr_disp[S][P]
+        if not self.curr_total[S][P] > 0:
+            del self.curr_total[S][P]
     
     def calculate_bbo(self, S):
         '''
         update the bbo on the given side
         '''
+        # Python's max/min over the dict keys avoid building an array of all levels on every update
         if S == 'Bid':
-            self.best_bid = np.array(list(self.curr_disp[S].keys())).max() if len(self.curr_disp[S]) > 0 else np.nan
+            self.best_bid = max(self.curr_disp[S]) if len(self.curr_disp[S]) > 0 else np.nan
             self.best_bid_qty = self.curr_disp[S].get(self.best_bid, np.nan)
-            self.best_bid_h = np.array(list(self.curr_total[S].keys())).max() if len(self.curr_total[S]) > 0 else np.nan
+            self.best_bid_h = max(self.curr_total[S]) if len(self.curr_total[S]) > 0 else np.nan
             self.best_bid_h_qty = self.curr_total[S].get(self.best_bid_h, np.nan)
         if S == 'Ask':
-            self.best_ask = np.array(list(self.curr_disp[S].keys())).min() if len(self.curr_disp[S]) > 0 else np.nan
+            self.best_ask = min(self.curr_disp[S]) if len(self.curr_disp[S]) > 0 else np.nan
             self.best_ask_qty = self.curr_disp[S].get(self.best_ask, np.nan)
-            self.best_ask_h = np.array(list(self.curr_total[S].keys())).min() if len(self.curr_total[S]) > 0 else np.nan
+            self.best_ask_h = min(self.curr_total[S]) if len(self.curr_total[S]) > 0 else np.nan
             self.best_ask_h_qty = self.curr_total[S].get(self.best_ask_h, np.nan)
             
     def UpdateBBO(self, k, S, P, qty, qty_h):
@@ -81,25 +104,21 @@ class OrderBook(object):
         '''
         self.curr_disp[S][P] = qty
         self.curr_total[S][P] = qty_h
-        self.clean_book(S)
+        self.clean_book(S, P)
         self.calculate_bbo(S)
 
-        # Update records of depth updates in depth_updates dictionary
+        # Update records of depth updates in depth_updates lists
         # Current depth at the book change
-        self._depth_updates[(k, S, P, 'Disp')] = qty
-        self._depth_updates[(k, S, P, 'Total')] = qty_h
-
-        # Update output top dataframe (BBO)
-        self._top.at[k, 'BestBid'] = self.best_bid
-        self._top.at[k, 'BestBidQty'] = self.best_bid_qty
-        self._top.at[k, 'BestAsk'] = self.best_ask
-        self._top.at[k, 'BestAskQty'] = self.best_ask_qty
+        self._depth_updates['ix'].append(k)
+        self._depth_updates['S'].append(S)
+        self._depth_updates['P'].append(P)
+        self._depth_updates['Disp'].append(qty)
+        self._depth_updates['Total'].append(qty_h)
 
-        # Update BBO for Best Bid/Ask including hidden Qty
-        self._top.at[k, 'BestBid_h'] = self.best_bid_h
-        self._top.at[k, 'BestBidQty_h'] = self.best_bid_h_qty
-        self._top.at[k, 'BestAsk_h'] = self.best_ask_h
-        self._top.at[k, 'BestAskQty_h'] = self.best_ask_h_qty
+        # Update output top of book (BBO), including Best Bid/Ask with hidden Qty
+        # The order of the values follows bbo_cols
+        self._bbo[k] = (self.best_bid, self.best_bid_qty, self.best_ask, self.best_ask_qty,
+                        self.best_bid_h, self.best_bid_h_qty, self.best_ask_h, self.best_ask_h_qty)
 
     def UpdateLvl(self, S, P, k, j):
         '''
@@ -110,15 +129,12 @@ class OrderBook(object):
         - k is the book updating message index for the outbound quote message we loop over
         - j and k are equal in cases where j is for the index for the first message 
         '''
-        df = self._df
         if (S, P) not in self.lvls.keys():
             self.lvls[(S, P)] = OrderBookLvl(S, P)
         booklevel = self.lvls[(S, P)]
-        unique_order_id = df.at[j, 'UniqueOrderID']
-        booklevel.orders[unique_order_id] = df.at[j, 'DisplayQty'] # Add Displayed Quantity to the dictionary
-        booklevel.orders_h[unique_order_id] = df.at[j, 'LeavesQty'] # Add Total Quantity to the dictionary
-        booklevel.curr_depth = np.array(list(booklevel.orders.values())).sum() # Calculate current displayed depth
-        booklevel.curr_depth_h = np.array(list(booklevel.orders_h.values())).sum() # Calculate current total depth
+        unique_order_id = self._unique_order_id[j]
+        # Add Displayed and Total Quantity to the dictionaries and update the current depths
+        booklevel.update_order(unique_order_id, self._display_qty[j], self._leaves_qty[j])
         self.UpdateBBO(k, booklevel.S, booklevel.P, booklevel.curr_depth, booklevel.curr_depth_h)
 
     def UpdatePrevLvl(self, S, P, k, j):
@@ -128,53 +144,46 @@ class OrderBook(object):
         Removes a given order from the depth structure and 
         updates the book without that order    
         '''    
-        df = self._df
         if (S, P) not in self.lvls.keys():
             self.lvls[(S, P)] = OrderBookLvl(S, P)
         booklevel = self.lvls[(S, P)]
-        unique_order_id = df.at[j, 'UniqueOrderID']
-        booklevel.orders[unique_order_id] = 0
-        booklevel.orders_h[unique_order_id] = 0
-        booklevel.curr_depth = np.array(list(booklevel.orders.values())).sum()
-        booklevel.curr_depth_h = np.array(list(booklevel.orders_h.values())).sum()
+        unique_order_id = self._unique_order_id[j]
+        booklevel.update_order(unique_order_id, 0, 0)
         self.UpdateBBO(k, booklevel.S, booklevel.P, booklevel.curr_depth, booklevel.curr_depth_h)
         
     def Correctlvl(self, P, correct_side, correct_type, strict, k): 
         # Apply order book corrections logic
-        curr_disp = list(self.curr_disp[correct_side].keys())
-        curr_total = list(self.curr_total[correct_side].keys())
+        # Kill the levels on correct_side at prices strictly (strict) or weakly (not strict)
+        # above P for the Bid and below P for the Ask. The levels to kill are found before 
+        # killing any of them, for displayed and for total qty. The depth killed is 
+        # summed over the levels (missing depth counts as zero) before they are killed.
         if correct_side == 'Bid':
-            need_to_kill =  (strict and self.best_bid > P) or (not strict and self.best_bid >= P)
-            need_to_kill_h = (strict and self.best_bid_h > P) or (not strict and self.best_bid_h >= P)
+            beyond = operator.gt if strict else operator.ge
         if correct_side == 'Ask':
-            need_to_kill =  (strict and self.best_ask < P) or (not strict and self.best_ask <= P) 
-            need_to_kill_h = (strict and self.best_ask_h < P) or (not strict and self.best_ask_h <= P) 
+            beyond = operator.lt if strict else operator.le
+        kill_disp = [plvl for plvl in self.curr_disp[correct_side] if beyond(plvl, P)]
+        kill_total = [plvl for plvl in self.curr_total[correct_side] if beyond(plvl, P)]
         # Kill any order need to be killed for displayed qty
-        if P > 0 and need_to_kill:
-            for plvl in curr_disp:
-                if (correct_side == 'Bid' and ((strict and plvl > P) or (not strict and plvl >= P))) or \
-                   (correct_side == 'Ask' and ((strict and plvl < P) or (not strict and plvl <= P))):
-                    self._top.at[k,'DepthKilled'] = self._top.at[k, 'DepthKilled'] + na_to_zero(self.lvls[(correct_side, plvl)].curr_depth)
-                    self._top.at[k,'Corrections_%s' % correct_type] = self._top.at[k, 'Corrections_%s' % correct_type] + 1
-                    self.UpdateKillLvl(correct_side, plvl, k)
+        if P > 0 and kill_disp:
+            depth_killed = np.nan_to_num([self.lvls[(correct_side, plvl)].curr_depth for plvl in kill_disp]).sum()
+            for plvl in kill_disp:
+                self.UpdateKillLvl(correct_side, plvl, k)
+            self._top.at[k, 'DepthKilled'] = self._top.at[k, 'DepthKilled'] + depth_killed
+            self._top.at[k, 'Corrections_%s' % correct_type] = self._top.at[k, 'Corrections_%s' % correct_type] + len(kill_disp)
         # Kill any order need to be killed for total qty
-        if P > 0 and need_to_kill_h:
-            for plvl in curr_total:
-                if (correct_side == 'Bid' and ((strict and plvl > P) or (not strict and plvl >= P))) or \
-                   (correct_side == 'Ask' and ((strict and plvl < P) or (not strict and plvl <= P))):
-                    self._top.at[k,'DepthKilled_h'] = self._top.at[k, 'DepthKilled_h'] + na_to_zero(self.lvls[(correct_side, plvl)].curr_depth_h)
-                    self._top.at[k,'Corrections_%s_h' % correct_type] = self._top.at[k, 'Corrections_%s_h' % correct_type] + 1
-                    self.UpdateKillLvl(correct_side, plvl, k)
+        if P > 0 and kill_total:
+            depth_killed_h = np.nan_to_num([self.lvls[(correct_side, plvl)].curr_depth_h for plvl in kill_total]).sum()
+            for plvl in kill_total:
+                self.UpdateKillLvl(correct_side, plvl, k)
+            self._top.at[k, 'DepthKilled_h'] = self._top.at[k, 'DepthKilled_h'] + depth_killed_h
+            self._top.at[k, 'Corrections_%s_h' % correct_type] = self._top.at[k, 'Corrections_%s_h' % correct_type] + len(kill_total)
 
     def UpdateKillLvl(self, S, P, k):
         # Kill the entire Level (set all depth and volume to empty)
         if (S, P) not in self.lvls.keys():
             self.lvls[(S, P)] = OrderBookLvl(S, P)
         booklevel = self.lvls[(S, P)]
-        booklevel.orders = {}
-        booklevel.orders_h = {}
-        booklevel.curr_depth = np.nan
-        booklevel.curr_depth_h = np.nan
+        booklevel.clear()
         self.UpdateBBO(k, booklevel.S, booklevel.P, np.nan, np.nan)
 
 class OrderBookLvl(object):
@@ -187,14 +196,41 @@ class OrderBookLvl(object):
         orders_h: Total depth of active orders {UniqueOrderID:qty_h}
         curr_depth: Current displayed depth
         curr_depth_h: Current total depth
+    The depths are kept as running sums of the non-missing quantities in orders/orders_h 
+    together with the number of missing quantities, so that an update does not need to 
+    sum over all orders at the level. A depth is missing if any order has missing quantity.
     '''
     def __init__(self, S, P):
         self.S = S                  
         self.P = P                  
+        self.clear()
+
+    def clear(self):
+        '''
+        Remove all orders from the level
+        '''
         self.orders = {}            
         self.orders_h = {}          
         self.curr_depth = np.nan
         self.curr_depth_h = np.nan
+        self.depth_sum, self.depth_sum_h = 0, 0
+        self.n_missing, self.n_missing_h = 0, 0
+
+    def update_order(self, unique_order_id, qty, qty_h):
+        '''
+        Set the displayed (qty) and total (qty_h) quantity of an order 
+        and update the current depths of the level
+        '''
+        prev_qty = self.orders.get(unique_order_id, 0)
+        prev_qty_h = self.orders_h.get(unique_order_id, 0)
+        self.orders[unique_order_id] = qty
+        self.orders_h[unique_order_id] = qty_h
+        self.depth_sum += na_to_zero(qty) - na_to_zero(prev_qty)
+        self.depth_sum_h += na_to_zero(qty_h) - na_to_zero(prev_qty_h)
+        self.n_missing += int(np.isnan(qty)) - int(np.isnan(prev_qty))
+        self.n_missing_h += int(np.isnan(qty_h)) - int(np.isnan(prev_qty_h))
+        self.curr_depth = np.nan if self.n_missing > 0 else self.depth_sum
+        self.curr_depth_h = np.nan if self.n_missing_h > 0 else self.depth_sum_h
 
 def na_to_zero(num):
     if np.isnan(num):
@@ -4,7 +4,40 @@ Orders.py
 Class object to keep track of order price and quantity information
 '''
 
-import numpy as np
+# Missing price/quantity (the same float value as np.nan)
+NAN = float('nan')
+
+# Quote statuses. The status of a quote is represented by its integer code,
+# i.e. its position in quote_statuses. Numbers in the labels are FIX OrdStatus values.
+quote_statuses = [
+    'None',
+    'Accepted (0)',
+    'Executed (1)',
+    'Executed (2)',
+    'Cancelled (4)',
+    'Amended (5)',
+    'Expired (6)',
+    'Rejected (8)',
+    'Suspended (9)',
+    'No ME Response',
+]
+(QS_NONE, QS_ACCEPTED, QS_EXECUTED_PART, QS_EXECUTED_FULL, QS_CANCELLED, 
+ QS_AMENDED, QS_EXPIRED, QS_REJECTED, QS_SUSPENDED, QS_NO_ME_RESPONSE) = range(len(quote_statuses))
+
+# Lookup table for the expected ME responses to a quote update given the status of the quote.
+# Entries are (expect_add, expect_cancel, changed_expect_add, changed_expect_amend), where the 
+# last two apply only if the quote price or quantity changed.
+quote_expectations = [None] * len(quote_statuses)
+# Case 1: No previously accepted quote
+quote_expectations[QS_NONE] = (True, False, False, False)
+# Case 2: Last accepted quote was accepted or suspended
+for status in (QS_ACCEPTED, QS_SUSPENDED, QS_AMENDED, QS_EXECUTED_PART):
+    quote_expectations[status] = (False, True, False, True)
+# Case 3: Last accepted quote was executed in full or cancelled
+for status in (QS_EXECUTED_FULL, QS_EXPIRED, QS_CANCELLED, QS_REJECTED):
+    quote_expectations[status] = (True, False, False, False)
+# Case 4: Last quote did not receive ME response
+quote_expectations[QS_NO_ME_RESPONSE] = (False, False, True, True)
 
 class Order(object):
     '''
@@ -13,13 +46,13 @@ class Order(object):
     Amend for quotes can be understood as changing an existing quote
     '''
     def __init__(self):
-        self.cancel_prc = np.nan
-        self.cancel_qty = np.nan
-        self.gw_prc = np.nan
-        self.gw_qty = np.nan
-        self.me_prc = np.nan
-        self.me_qty = np.nan
-    def add(self, p = np.nan, q = np.nan):
+        self.cancel_prc = NAN
+        self.cancel_qty = NAN
+        self.gw_prc = NAN
+        self.gw_qty = NAN
+        self.me_prc = NAN
+        self.me_qty = NAN
+    def add(self, p = NAN, q = NAN):
         '''
         Add price and quantity from current inbound message
         '''
@@ -33,7 +66,7 @@ class Order(object):
         '''
         self.cancel_prc = self.gw_prc
         self.cancel_qty = self.me_qty
-        self.me_qty = np.nan
+        self.me_qty = NAN
     def cancel_reject(self):
         '''
         This is like cancel, but we do not update the ME quantity.
@@ -42,7 +75,7 @@ class Order(object):
         '''
         self.cancel_prc = self.gw_prc
         self.cancel_qty = self.me_qty
-    def amend(self, p = np.nan, q = np.nan):
+    def amend(self, p = NAN, q = NAN):
         '''
         Set cancel price and quantity to previous message information
         and specify current price and quantity,
@@ -53,7 +86,7 @@ class Order(object):
         self.cancel_qty = self.me_qty
         self.gw_prc = p
         self.gw_qty = q
-    def amend_reject(self, p = np.nan, q = np.nan):
+    def amend_reject(self, p = NAN, q = NAN):
         '''
         This is the same as amend. It is used to be consistent with event classification logic
         Cancel price and quantity are used as the previous price and quantity
@@ -63,12 +96,12 @@ class Order(object):
         self.cancel_qty = self.me_qty
         self.gw_prc = p
         self.gw_qty = q
-    def passive_fill(self, leaves = np.nan):
+    def passive_fill(self, leaves = NAN):
         '''
         Update ME quantity
         '''
         self.me_qty = leaves
-    def update_me(self, q = np.nan):
+    def update_me(self, q = NAN):
         '''
         Update ME price and quantity
         '''
@@ -79,18 +112,20 @@ class Quote(object):
     '''
     Class object to keep track of quote price and quantity information
     '''
+    __slots__ = ('cancel_prc', 'cancel_qty', 'gw_prc', 'gw_qty', 'me_prc', 'me_qty',
+                 'status', 'expect_add', 'expect_amend', 'expect_cancel')
     def __init__(self):
-        self.cancel_prc = np.nan
-        self.cancel_qty = np.nan
-        self.gw_prc = np.nan
-        self.gw_qty = np.nan
-        self.me_prc = np.nan
-        self.me_qty = np.nan
-        self.status = 'None'
+        self.cancel_prc = NAN
+        self.cancel_qty = NAN
+        self.gw_prc = NAN
+        self.gw_qty = NAN
+        self.me_prc = NAN
+        self.me_qty = NAN
+        self.status = QS_NONE
         self.expect_add = False
         self.expect_amend = False
         self.expect_cancel = False
-    def update(self, p=np.nan, q=np.nan):
+    def update(self, p=NAN, q=NAN):
         '''
         Set cancel price and quantity to previous message information
         and specify current price and quantity. 
@@ -107,34 +142,16 @@ class Quote(object):
         order (e.g. if there is no order, then we expect to add a new order 
         but not to cancel or amend)
         '''
-        self.expect_add = False
-        self.expect_amend = False
-        self.expect_cancel = False
-        # Case 1: No previously accepted quote
-        if self.status in ('None'):
-            self.expect_add = True
-        # Case 2: Last accepted quote was accepted or suspended
-        elif self.status in ('Accepted (0)', 'Suspended (9)', 'Amended (5)', 'Executed (1)'):
-            self.expect_cancel = True
-            if (self.gw_prc != self.cancel_prc) or (self.gw_qty != self.cancel_qty):
-                self.expect_amend = True
-        # Case 3: Last accepted quote was executed in full or cancelled
-        elif self.status in ('Executed (2)', 'Expired (6)', 'Cancelled (4)', 'Rejected (8)'):
-            self.expect_add = True
-        # Case 4: Last quote did not receive ME response
-        elif self.status in ('No ME Response'):
-            if (self.gw_prc != self.cancel_prc) or (self.gw_qty != self.cancel_qty):
-                self.expect_add, self.expect_amend = True, True
-    def update_reject(self, p=np.nan, q=np.nan):
-        '''
-        This is the same as update. It is included for event classification logic consistency.
-        Cancel price and quantity are used as the previous price and quantity
-        for cancel/replace reject messages
-        '''
-        self.cancel_prc = self.gw_prc
-        self.cancel_qty = self.me_qty
-        self.gw_prc = p
-        self.gw_qty = q
+        expect_add, expect_cancel, changed_expect_add, changed_expect_amend = quote_expectations[self.status]
+        self.expect_add, self.expect_amend, self.expect_cancel = expect_add, False, expect_cancel
+        # If the quote was changed, we may also expect an add or an amend
+        if changed_expect_amend and ((self.gw_prc != self.cancel_prc) or (self.gw_qty != self.cancel_qty)):
+            self.expect_add = expect_add or changed_expect_add
+            self.expect_amend = True
+    # update_reject is the same as update. It is included for event classification logic consistency.
+    # Cancel price and quantity are used as the previous price and quantity
+    # for cancel/replace reject messages
+    update_reject = update
     def cancel(self):
         '''
         Set cancel price and quantity to previous message information.
@@ -143,8 +160,8 @@ class Quote(object):
         '''
         self.cancel_prc = self.gw_prc
         self.cancel_qty = self.me_qty
-        self.me_qty = np.nan
-        self.status = 'Cancelled (4)'
+        self.me_qty = NAN
+        self.status = QS_CANCELLED
     def cancel_reject(self):
         '''
         This is like cancel, but we do not update the ME quantity
@@ -153,13 +170,13 @@ class Quote(object):
         '''
         self.cancel_prc = self.gw_prc
         self.cancel_qty = self.me_qty
-    def passive_fill(self, leaves=np.nan, st='None'):
+    def passive_fill(self, leaves=NAN, st=QS_NONE):
         '''
         Update ME quantity
         '''
         self.me_qty = leaves
         self.status = st
-    def update_me(self, q=np.nan, st='None'):
+    def update_me(self, q=NAN, st=QS_NONE):
         '''
         Update ME price and quantity
         '''
@@ -167,5 +184,5 @@ class Quote(object):
         self.me_qty = q
         self.status = st
     def no_me_response(self):
-        self.status = 'No ME Response'
+        self.status = QS_NO_ME_RESPONSE
         
\ No newline at end of file
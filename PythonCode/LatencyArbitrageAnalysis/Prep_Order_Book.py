@@ -582,8 +582,9 @@ def prepare_order_book(runtime, date, sym, args, paths):
                         'Corrections_OrderAccept_h': 0,'Corrections_Trade_h': 0,  
                         'Corrections_notA_h': 0, 
                         'DepthKilled': 0, 'DepthKilled_h': 0}, index=msgs.index)
-    # Initialize dictionaries for records of depth updates
-    depth_updates = {}
+    # Initialize records of depth updates: one list per field, with one entry per update of 
+    # the depth at a side and price (message index, side, price, displayed depth, total depth)
+    depth_updates = {'ix': [], 'S': [], 'P': [], 'Disp': [], 'Total': []}
 
     # Initialize order book data structure
     Book = OrderBook(msgs, top, depth_updates)
@@ -906,48 +907,38 @@ def prepare_order_book(runtime, date, sym, args, paths):
     ## Clean Depth data structure
     logger.info('Creating depth info data structure...')
 
-    # Convert from Dictionary to DataFrame (Book is the deepest level with the depth info)
-    depth_updates = pd.DataFrame.from_dict(depth_updates, orient = 'index').reset_index()
-    depth_updates[['ix', 'S', 'P', 'Book']] = pd.DataFrame(depth_updates['index'].to_list(), index = depth_updates.index)
-    depth_updates = depth_updates[['ix', 'S', 'P', 'Book', 0]] # re-order the columns
-    depth_updates.columns = ['ix', 'S', 'P', 'Book', 'Value']
+    # Convert from lists to DataFrame. If the depth at a side and price is updated 
+    # more than once at the same message, keep the last update
+    depth_updates = pd.DataFrame(depth_updates).drop_duplicates(['ix', 'S', 'P'], keep='last')
 
     # Initialize tree structure for final depth output. This will convert the original depth dictionary
     # for each side, price, and update message to a dictionary of depths and updating message indices
     # for side, price and depth type (displayed, hidden)
     depth = {'bid' : {}, 'ask': {}, 'bid_h': {}, 'ask_h': {}}
 
-    # Flag messages on the bid, on the ask and with displayed depth
-    is_disp = depth_updates['Book'] == 'Disp' 
+    # Flag messages on the bid and on the ask
     is_bid = depth_updates['S'] == 'Bid'
     is_ask =  depth_updates['S'] == 'Ask'
 
-    # Get dataframe of updates to displayed depth on bid and displayed depth on ask
-    bids = depth_updates.loc[is_disp & is_bid]
-    asks = depth_updates.loc[is_disp & is_ask]
-    # For each unique price for displayed depth on the bid (ask), get the index for all updates at that price
+    # Get dataframe of updates on bid and on ask
+    bids = depth_updates.loc[is_bid]
+    asks = depth_updates.loc[is_ask]
+    # For each unique price on the bid (ask), get the index for all updates at that price
     # and the displayed depth at that index and add it to the dictionary with the side and price as keys
     for p in bids['P'].unique():
         bids_p = bids.loc[bids['P'] == p]
-        depth['bid'][p] = pd.Series(bids_p['Value'].values, index = bids_p['ix'].values).sort_index()
+        depth['bid'][p] = pd.Series(bids_p['Disp'].values, index = bids_p['ix'].values).sort_index()
     for p in asks['P'].unique():
         asks_p = asks.loc[asks['P'] == p]
-        depth['ask'][p] = pd.Series(asks_p['Value'].values, index = asks_p['ix'].values).sort_index()
+        depth['ask'][p] = pd.Series(asks_p['Disp'].values, index = asks_p['ix'].values).sort_index()
 
     # Repeat for Total depth
-    is_total = depth_updates['Book'] == 'Total'
-    is_bid = depth_updates['S'] == 'Bid'
-    is_ask = depth_updates['S'] == 'Ask'
-
-    bids = depth_updates.loc[is_total & is_bid] 
-    asks = depth_updates.loc[is_total & is_ask]
-
     for p in bids['P'].unique():
         bids_p = bids.loc[bids['P'] == p]
-        depth['bid_h'][p] = pd.Series(bids_p['Value'].values, index = bids_p['ix'].values).sort_index()
+        depth['bid_h'][p] = pd.Series(bids_p['Total'].values, index = bids_p['ix'].values).sort_index()
     for p in asks['P'].unique():
         asks_p = asks.loc[asks['P'] == p]
-        depth['ask_h'][p] = pd.Series(asks_p['Value'].values, index = asks_p['ix'].values).sort_index()
+        depth['ask_h'][p] = pd.Series(asks_p['Total'].values, index = asks_p['ix'].values).sort_index()
 
     ### OUTPUT ###
 
@@ -963,8 +954,9 @@ def prepare_order_book(runtime, date, sym, args, paths):
 
     logger.info('Writing to file...')
 
-    # Save top of book data
-    top.to_csv(outfile_top, compression = 'gzip')
+    # Save top of book data. This is a temp file re-read by the later steps,
+    # so use a fast gzip level rather than the default (9)
+    top.to_csv(outfile_top, compression = {'method': 'gzip', 'compresslevel': 1})
 
     # Save depth of book data
     pickle.dump(depth, open(outfile_depth, 'wb'), protocol=pickle.HIGHEST_PROTOCOL)
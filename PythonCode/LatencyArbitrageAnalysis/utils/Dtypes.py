@@ -8,13 +8,14 @@ data.
 '''
 
 ## dtypes for exchange message data after pre-processing
+# The low-cardinality message type fields are read in as categoricals.
 dtypes_raw_msgs = {
       'ClientOrderID':'O', 'UniqueOrderID':'O', 'TradeMatchID': 'O', 
       'UserID':'O', 'FirmID':'O', 'SessionID':'float64',
-      'MessageTimestamp':'O', 'MessageType':'O', 'OrderType':'O',
-      'ExecType':'O', 'OrderStatus':'O', 'TradeInitiator':'O', 
-      'TIF':'O', 'CancelRejectReason': 'O',
-      'Side':'O', 'OrderQty':'float64', 'DisplayQty':'float64', 
+      'MessageTimestamp':'O', 'MessageType':'category', 'OrderType':'category',
+      'ExecType':'category', 'OrderStatus':'category', 'TradeInitiator':'category', 
+      'TIF':'category', 'CancelRejectReason': 'category',
+      'Side':'category', 'OrderQty':'float64', 'DisplayQty':'float64', 
       'LimitPrice':'float64', 'StopPrice':'float64',
       'ExecutedPrice': 'float64',  'ExecutedQty': 'float64', 'LeavesQty': 'float64',
       'QuoteRelated':'bool',
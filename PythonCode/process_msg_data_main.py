@@ -277,8 +277,10 @@ if __name__ == '__main__':
     time_st = datetime.datetime.now()
     print('Start Processing Message Data: %s' % str(time_st))
     print('runtime: %s' % runtime)
-    pool = multiprocessing.Pool(num_workers)
-    results = pool.map(multi_process_wrapper, args_list)
+    # Symbol-dates differ a lot in size, so hand them out one at a time
+    # (chunksize=1) instead of in pre-assigned batches to keep all workers busy
+    with multiprocessing.Pool(num_workers) as pool:
+        results = pool.map(multi_process_wrapper, args_list, chunksize=1)
     print('Finished Processing Message Data: %s' % str(datetime.datetime.now() - time_st))
     ###################################################################################
     # Monitor logs to check if all sym-dates are finished.